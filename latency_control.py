@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+延迟预算控制器 - 根据实测的各阶段耗时，运行时调整推理尺寸、跳帧步长和切片
+"""
+
+import math
+import time
+from collections import deque
+
+
+class LatencyController:
+    """
+    按目标帧率维持实时处理的自适应控制器
+
+    控制器维护一个从"高质量"到"高速度"排列的档位表，每档由
+    (切片网格, 推理尺寸, 跳帧步长) 组成。每处理一帧记录各阶段耗时，
+    平均帧耗时超出预算就降档，富余足够就升档，每次调整都会打印日志。
+    """
+
+    def __init__(self, target_fps, max_imgsz=640, min_imgsz=256, max_stride=4,
+                 tiles=1, window=20, hysteresis=0.15, cooldown=10, verbose=True):
+        if target_fps <= 0:
+            raise ValueError("目标帧率必须大于0")
+
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps  # 每个源帧的时间预算（秒）
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.verbose = verbose
+
+        self.levels = self._build_levels(max_imgsz, min_imgsz, max_stride, tiles)
+        self.index = 0
+
+        self.frame_times = deque(maxlen=window)
+        self.stage_times = {}
+        self._current = {}
+        self._frames_since_change = 0
+        self.history = []  # 所有调整记录
+
+    @staticmethod
+    def _build_levels(max_imgsz, min_imgsz, max_stride, tiles):
+        """生成档位表：先关切片，再降分辨率，最后加大跳帧步长"""
+        levels = []
+        # 推理尺寸必须是32的倍数：上限向下取整，下限向上取整，都不越过用户给定的范围
+        max_imgsz = max(32, max_imgsz // 32 * 32)
+        min_imgsz = min(max(32, -(-min_imgsz // 32) * 32), max_imgsz)
+        if tiles > 1:
+            levels.append({'tiles': tiles, 'imgsz': max_imgsz, 'stride': 1})
+
+        sizes = []
+        size = max_imgsz
+        while size >= min_imgsz:
+            sizes.append(size)
+            size -= 96 if size > 416 else 64
+            size = size // 32 * 32
+        if sizes[-1] != min_imgsz:
+            sizes.append(min_imgsz)
+
+        for size in sizes:
+            levels.append({'tiles': 1, 'imgsz': size, 'stride': 1})
+        for stride in range(2, max_stride + 1):
+            levels.append({'tiles': 1, 'imgsz': sizes[-1], 'stride': stride})
+        return levels
+
+    @property
+    def level(self):
+        """当前档位"""
+        return self.levels[self.index]
+
+    @property
+    def imgsz(self):
+        return self.level['imgsz']
+
+    @property
+    def stride(self):
+        return self.level['stride']
+
+    @property
+    def tiles(self):
+        return self.level['tiles']
+
+    def stage(self, name):
+        """计时上下文：with controller.stage('infer'): ..."""
+        return _StageTimer(self, name)
+
+    def record(self, name, seconds):
+        """记录当前帧某个阶段的耗时"""
+        self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def end_frame(self):
+        """
+        结束一帧的计时并按需调整档位
+
+        返回 True 表示档位发生了变化。
+        """
+        total = sum(self._current.values())
+        self.frame_times.append(total)
+        for name, seconds in self._current.items():
+            times = self.stage_times.setdefault(name, deque(maxlen=self.frame_times.maxlen))
+            times.append(seconds)
+        self._current = {}
+        self._frames_since_change += 1
+
+        # 刚调整过或样本不足时不动作，避免来回震荡
+        if self._frames_since_change < self.cooldown or len(self.frame_times) < self.cooldown:
+            return False
+
+        avg = self.average_frame_time()
+        allowed = self.budget * self.stride  # 跳帧后每处理一帧可用的时间
+
+        if avg > allowed * (1 + self.hysteresis) and self.index < len(self.levels) - 1:
+            return self._change(self.index + 1, avg, allowed)
+
+        if self.index > 0:
+            better = self.levels[self.index - 1]
+            predicted = self._predict(better)
+            if predicted < self.budget * better['stride'] * (1 - self.hysteresis):
+                return self._change(self.index - 1, avg, allowed)
+
+        return False
+
+    def average_frame_time(self):
+        """窗口内平均每处理帧耗时（秒）"""
+        if not self.frame_times:
+            return 0.0
+        return sum(self.frame_times) / len(self.frame_times)
+
+    def average_stage_time(self, name):
+        """窗口内某阶段的平均耗时（秒）"""
+        times = self.stage_times.get(name)
+        if not times:
+            return 0.0
+        return sum(times) / len(times)
+
+    def _predict(self, level):
+        """按推理面积比例估算切换到另一档后的每帧耗时"""
+        infer = self.average_stage_time('infer')
+        other = self.average_frame_time() - infer
+        scale = (level['imgsz'] / self.imgsz) ** 2 * (level['tiles'] ** 2) / (self.tiles ** 2)
+        return other + infer * scale
+
+    def _change(self, index, avg, allowed):
+        old_index, old = self.index, self.level
+        self.index = index
+        new = self.level
+        self._frames_since_change = 0
+        self.frame_times.clear()
+        self.stage_times.clear()
+
+        entry = {
+            'time': time.time(),
+            'from': old,
+            'to': new,
+            'frame_ms': avg * 1000,
+            'budget_ms': allowed * 1000,
+        }
+        self.history.append(entry)
+
+        if self.verbose:
+            direction = "⬇️  降档" if index > old_index else "⬆️  升档"
+            print(f"{direction}: {self.describe(old)} -> {self.describe(new)} "
+                  f"(帧耗时 {avg * 1000:.1f}ms, 预算 {allowed * 1000:.1f}ms)")
+        return True
+
+    @staticmethod
+    def describe(level):
+        """档位的可读描述"""
+        text = f"imgsz={level['imgsz']} stride={level['stride']}"
+        if level['tiles'] > 1:
+            text += f" tiles={level['tiles']}x{level['tiles']}"
+        return text
+
+    def summary(self):
+        """运行结束后的统计信息"""
+        avg = self.average_frame_time()
+        fps = math.inf if avg == 0 else self.stride / avg
+        return (f"当前档位 {self.describe(self.level)}, 调整 {len(self.history)} 次, "
+                f"有效处理速度 {fps:.1f} 源帧/秒 (目标 {self.target_fps:.1f})")
+
+
+class _StageTimer:
+    """LatencyController.stage() 返回的计时器"""
+
+    def __init__(self, controller, name):
+        self.controller = controller
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.controller.record(self.name, time.perf_counter() - self.start)
+        return False
@@ -3,13 +3,71 @@
 实时显示检测结果
 """
 
-from ultralytics import YOLO
 import cv2
-import sys
+import argparse
 from pathlib import Path
 
-def detect_video(video_path, model_path='runs/red-alert_20250901_001914/weights/best.pt'):
+from latency_control import LatencyController
+from video_source import VideoSource
+from telemetry import telemetry, add_arguments, setup_from_args
+
+
+def detect_tiled(model, frame, grid, imgsz, conf=0.25, overlap=0.1, iou=0.5):
+    """
+    把帧切成 grid x grid 块批量推理，合并并绘制检测框
+
+    相邻切片向外多取 overlap（切片边长的比例），跨切缝的单位至少在一块里
+    完整出现；合并后按类别做一次 NMS，去掉重叠区域里的重复框。
+    """
+    import torch
+    from torchvision.ops import batched_nms
+
+    h, w = frame.shape[:2]
+    th, tw = h // grid, w // grid
+    my, mx = int(th * overlap), int(tw * overlap)
+    crops, offsets = [], []
+    for row in range(grid):
+        for col in range(grid):
+            y0, x0 = max(0, row * th - my), max(0, col * tw - mx)
+            y1 = h if row == grid - 1 else min(h, (row + 1) * th + my)
+            x1 = w if col == grid - 1 else min(w, (col + 1) * tw + mx)
+            crops.append(frame[y0:y1, x0:x1])
+            offsets.append((x0, y0))
+
+    results = model(crops, imgsz=imgsz, conf=conf, verbose=False)
+
+    # 各切片的框平移回整帧坐标
+    boxes, scores, classes = [], [], []
+    for result, (x0, y0) in zip(results, offsets):
+        if result.boxes is None or not len(result.boxes):
+            continue
+        xyxy = result.boxes.xyxy.detach().cpu().clone()
+        xyxy[:, [0, 2]] += x0
+        xyxy[:, [1, 3]] += y0
+        boxes.append(xyxy)
+        scores.append(result.boxes.conf.detach().cpu())
+        classes.append(result.boxes.cls.detach().cpu())
+
+    annotated = frame.copy()
+    if not boxes:
+        return annotated, 0
+
+    boxes, scores, classes = torch.cat(boxes), torch.cat(scores), torch.cat(classes)
+    keep = batched_nms(boxes.float(), scores.float(), classes.long(), iou).tolist()
+    for i in keep:
+        x1, y1, x2, y2 = [int(v) for v in boxes[i].tolist()]
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(annotated, f"{model.names[int(classes[i])]} {float(scores[i]):.2f}",
+                    (x1, max(y1 - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+    return annotated, len(keep)
+
+
+def detect_video(video_path, model_path='runs/red-alert_20250901_001914/weights/best.pt',
+                 target_fps=None, adaptive=False, tiles=1, max_imgsz=640, min_imgsz=256,
+                 max_stride=4, start=None, end=None, backend='auto'):
     """实时检测并显示视频"""
+    from ultralytics import YOLO
     
     # 加载模型
     print(f"📦 加载模型...")
@@ -21,16 +79,32 @@ def detect_video(video_path, model_path='runs/red-alert_20250901_001914/weights/
         print(f"❌ 文件不存在: {video_path}")
         return
     
-    cap = cv2.VideoCapture(str(video_path))
+    source = VideoSource(video_path, start=start, end=end, backend=backend)
+    frames = iter(source)
     
     # 获取视频信息
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = int(source.fps)
     
-    print(f"🎬 视频: {width}x{height} @ {fps}fps")
+    print(f"🎬 视频: {source.describe()}")
     print(f"🎮 按 'q' 退出, 空格暂停")
     
+    # 自适应延迟控制：按目标帧率调整推理尺寸、跳帧步长和切片
+    controller = None
+    if adaptive:
+        controller = LatencyController(
+            target_fps or fps or 30,
+            max_imgsz=max_imgsz,
+            min_imgsz=min_imgsz,
+            max_stride=max_stride,
+            tiles=tiles,
+        )
+        print(f"⚙️  自适应模式: 目标 {controller.target_fps:.1f}fps, "
+              f"初始档位 {controller.describe(controller.level)}")
+    
+    # 各阶段同时上报给统计模块和延迟控制器
+    def stage(name):
+        return telemetry.span(name, controller)
+    
     # 创建窗口
     window_name = "红警单位检测 - 按Q退出"
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
@@ -41,34 +115,58 @@ def detect_video(video_path, model_path='runs/red-alert_20250901_001914/weights/
     
     while True:
         if not paused:
-            ret, frame = cap.read()
-            if not ret:
+            # 跳帧：被跳过的帧不做颜色转换，丢弃落后的帧
+            with stage('decode'):
+                if controller:
+                    source.stride = controller.stride
+                item = next(frames, None)
+            if item is None:
                 print("📹 视频播放完毕")
                 break
             
-            frame_count += 1
-            
-            # YOLO检测
-            results = model(frame, conf=0.25, verbose=False)
-            
-            # 绘制结果
-            annotated_frame = results[0].plot()
+            index, _, frame = item
+            frame_count = index + 1
+            telemetry.count('frames')
             
-            # 显示统计信息
-            num_detections = len(results[0].boxes) if results[0].boxes is not None else 0
+            # YOLO检测（非自适应模式下使用固定的 --tiles 和 --max-imgsz）
+            grid = controller.tiles if controller else tiles
+            if grid > 1:
+                with stage('infer'):
+                    annotated_frame, num_detections = detect_tiled(
+                        model, frame, grid, controller.imgsz if controller else max_imgsz)
+            else:
+                with stage('infer') as span:
+                    extra = {'imgsz': controller.imgsz} if controller else {}
+                    results = model(frame, conf=0.25, verbose=False, **extra)
+                telemetry.observe_speed(results[0].speed, span.start)
+                
+                # 绘制结果
+                with stage('plot'):
+                    annotated_frame = results[0].plot()
+                
+                # 显示统计信息
+                num_detections = len(results[0].boxes) if results[0].boxes is not None else 0
+            telemetry.count('detections', num_detections)
             
             # 添加文字信息
+            info = f"Frame: {frame_count} | Detections: {num_detections} | Press Q to quit"
+            if controller:
+                info = f"{controller.describe(controller.level)} | " + info
             cv2.putText(annotated_frame, 
-                       f"Frame: {frame_count} | Detections: {num_detections} | Press Q to quit", 
+                       info, 
                        (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 
                        1, (0, 255, 0), 2)
             
             # 显示帧
-            cv2.imshow(window_name, annotated_frame)
-        
-        # 键盘控制
-        key = cv2.waitKey(1 if not paused else 0) & 0xFF
+            with stage('display'):
+                cv2.imshow(window_name, annotated_frame)
+                key = cv2.waitKey(1) & 0xFF
+            
+            if controller:
+                controller.end_frame()
+        else:
+            key = cv2.waitKey(0) & 0xFF
         
         if key == ord('q'):  # 退出
             break
@@ -83,13 +181,55 @@ def detect_video(video_path, model_path='runs/red-alert_20250901_001914/weights/
             print(f"💾 保存帧: frame_{frame_count}.jpg")
     
     # 清理
-    cap.release()
+    source.release()
     cv2.destroyAllWindows()
+    if controller:
+        print(f"⚙️  {controller.summary()}")
     print("✅ 检测完成")
 
-if __name__ == "__main__":
-    # 默认视频路径
-    video_path = sys.argv[1] if len(sys.argv) > 1 else "~/Desktop/openra.mp4"
+def main():
+    parser = argparse.ArgumentParser(description='实时显示检测结果')
+    parser.add_argument('video', nargs='?', default='~/Desktop/openra.mp4',
+                        help='视频路径')
+    parser.add_argument('--model', type=str,
+                        default='runs/red-alert_20250901_001914/weights/best.pt',
+                        help='模型路径')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='启用延迟预算控制，落后时自动降低分辨率/跳帧')
+    parser.add_argument('--target-fps', type=float, default=None,
+                        help='目标帧率（默认使用视频帧率）')
+    parser.add_argument('--tiles', type=int, default=1,
+                        help='N x N 切片推理（自适应模式下仅在预算充足时使用）')
+    parser.add_argument('--max-imgsz', type=int, default=640,
+                        help='最大推理尺寸（非自适应模式下为切片推理尺寸）')
+    parser.add_argument('--min-imgsz', type=int, default=256,
+                        help='自适应模式最小推理尺寸')
+    parser.add_argument('--max-stride', type=int, default=4,
+                        help='自适应模式最大跳帧步长')
+    parser.add_argument('--start', type=float, default=None,
+                        help='起始时间（秒）')
+    parser.add_argument('--end', type=float, default=None,
+                        help='结束时间（秒）')
+    parser.add_argument('--backend', type=str, default='auto',
+                        choices=['auto', 'pyav', 'opencv'],
+                        help='解码后端')
+    add_arguments(parser)
+    
+    args = parser.parse_args()
+    setup_from_args(args)
     
     # 运行检测
-    detect_video(video_path)
\ No newline at end of file
+    detect_video(args.video, args.model,
+                 target_fps=args.target_fps,
+                 adaptive=args.adaptive,
+                 tiles=args.tiles,
+                 max_imgsz=args.max_imgsz,
+                 min_imgsz=args.min_imgsz,
+                 max_stride=args.max_stride,
+                 start=args.start,
+                 end=args.end,
+                 backend=args.backend)
+    telemetry.finish(args.profile)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+编译模型缓存 - 把 .pt 权重导出为冻结的 TorchScript 并缓存，短时任务直接加载
+
+缓存命中时只需要 torch / torchvision / cv2，不导入 ultralytics，
+预处理（letterbox）和后处理（NMS）在这里按 ultralytics 的方式实现。
+"""
+
+import json
+import shutil
+import hashlib
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = Path('.cache/models')
+
+
+def cache_key(weights, imgsz):
+    """权重路径 + 大小 + 修改时间 + 输入尺寸，权重更新后自动失效"""
+    weights = Path(weights).resolve()
+    stat = weights.stat()
+    raw = f"{weights}|{stat.st_size}|{stat.st_mtime_ns}|{imgsz}"
+    return f"{weights.stem}-{imgsz}-{hashlib.sha1(raw.encode()).hexdigest()[:12]}"
+
+
+def artifact_paths(weights, imgsz, cache_dir=DEFAULT_CACHE_DIR):
+    """返回 (TorchScript 文件, 元数据文件)"""
+    key = cache_key(weights, imgsz)
+    cache_dir = Path(cache_dir)
+    return cache_dir / f"{key}.torchscript", cache_dir / f"{key}.json"
+
+
+def compile_model(weights, imgsz=640, cache_dir=DEFAULT_CACHE_DIR):
+    """导出 TorchScript、冻结并保存到缓存目录，返回缓存文件路径"""
+    import torch
+    from ultralytics import YOLO
+
+    script_path, meta_path = artifact_paths(weights, imgsz, cache_dir)
+    script_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"🔨 编译模型: {weights} (imgsz={imgsz})")
+
+    # 在缓存目录里的副本上导出，不碰权重目录里已有的文件
+    staging = script_path.with_suffix('.pt')
+    shutil.copy2(weights, staging)
+    model = YOLO(str(staging))
+    exported = Path(model.export(format='torchscript', imgsz=imgsz, device='cpu'))
+
+    # 冻结：把参数折叠为常量，减少首次调用的图优化开销
+    module = torch.jit.load(str(exported), map_location='cpu').eval()
+    module = torch.jit.freeze(module)
+    torch.jit.save(module, str(script_path))
+    staging.unlink(missing_ok=True)
+    if exported != script_path:
+        exported.unlink(missing_ok=True)
+
+    meta = {'weights': str(Path(weights).resolve()), 'imgsz': imgsz,
+            'names': {int(k): v for k, v in model.names.items()}}
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False))
+    print(f"✅ 已缓存: {script_path}")
+    return script_path
+
+
+def letterbox(image, size, color=(114, 114, 114)):
+    """等比缩放并填充到 size x size，返回 (图像, 缩放比例, (左, 上) 填充)"""
+    h, w = image.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    if (nw, nh) != (w, h):
+        image = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    left, top = (size - nw) // 2, (size - nh) // 2
+    image = cv2.copyMakeBorder(image, top, size - nh - top, left, size - nw - left,
+                               cv2.BORDER_CONSTANT, value=color)
+    return image, r, (left, top)
+
+
+class CompiledModel:
+    """缓存的 TorchScript 检测模型（CPU）"""
+
+    def __init__(self, script_path, meta_path):
+        import torch
+
+        self.torch = torch
+        self.module = torch.jit.load(str(script_path), map_location='cpu').eval()
+        meta = json.loads(Path(meta_path).read_text())
+        self.imgsz = meta['imgsz']
+        self.names = {int(k): v for k, v in meta['names'].items()}
+
+    def warmup(self):
+        """用空白图跑一次前向，触发算子初始化"""
+        self.predict(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8))
+
+    def predict(self, image, conf=0.25, iou=0.45, max_det=300):
+        """
+        单张 BGR 图像推理
+
+        返回 [(x1, y1, x2, y2, 置信度, 类别), ...]，坐标为原图像素。
+        """
+        import torchvision
+
+        torch = self.torch
+        padded, r, (left, top) = letterbox(image, self.imgsz)
+        x = torch.from_numpy(np.ascontiguousarray(padded[..., ::-1].transpose(2, 0, 1)))
+        x = x.unsqueeze(0).float() / 255.0
+
+        # 关闭图执行器的 profiling 优化：短时进程只跑几次，优化本身反而更慢
+        with torch.no_grad(), torch.jit.optimized_execution(False):
+            pred = self.module(x)
+        if isinstance(pred, (list, tuple)):
+            pred = pred[0]
+
+        # (1, 4 + nc, N) -> (N, 4 + nc)
+        pred = pred[0].transpose(0, 1)
+        scores, classes = pred[:, 4:].max(dim=1)
+        keep = scores > conf
+        boxes, scores, classes = pred[keep, :4], scores[keep], classes[keep]
+        if boxes.numel() == 0:
+            return []
+
+        # xywh -> xyxy
+        xy, wh = boxes[:, :2], boxes[:, 2:] / 2
+        boxes = torch.cat([xy - wh, xy + wh], dim=1)
+        keep = torchvision.ops.batched_nms(boxes, scores, classes, iou)[:max_det]
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+        # 还原到原图坐标
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - left) / r).clamp(0, image.shape[1])
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - top) / r).clamp(0, image.shape[0])
+        return [(*box, score, int(cls)) for box, score, cls in
+                zip(boxes.tolist(), scores.tolist(), classes.tolist())]
+
+
+def load_compiled(weights, imgsz=640, cache_dir=DEFAULT_CACHE_DIR, warmup=False):
+    """加载缓存的编译模型，没有缓存时先编译"""
+    script_path, meta_path = artifact_paths(weights, imgsz, cache_dir)
+    if not script_path.exists() or not meta_path.exists():
+        compile_model(weights, imgsz, cache_dir)
+    model = CompiledModel(script_path, meta_path)
+    if warmup:
+        model.warmup()
+    return model
@@ -3,15 +3,14 @@
 实时监控训练进度
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
 from pathlib import Path
+import argparse
 import time
 import os
 
-def find_latest_run():
+def find_latest_run(runs_dir="runs"):
     """找到最新的训练目录"""
-    runs_dir = Path("runs")
+    runs_dir = Path(runs_dir)
     if not runs_dir.exists():
         return None
     
@@ -22,11 +21,13 @@ def find_latest_run():
     
     return max(dirs, key=os.path.getmtime)
 
-def monitor_training():
+def monitor_training(run_dir=None, interval=2.0):
     """监控训练过程"""
+    import pandas as pd
+    
     print("🔍 寻找训练目录...")
     
-    run_dir = find_latest_run()
+    run_dir = Path(run_dir) if run_dir else find_latest_run()
     if not run_dir:
         print("❌ 没有找到训练目录")
         return
@@ -74,14 +75,23 @@ def monitor_training():
             else:
                 print("⏳ 等待训练开始...")
             
-            time.sleep(2)  # 每2秒更新一次
+            time.sleep(interval)  # 定时刷新
             
         except KeyboardInterrupt:
             print("\n👋 退出监控")
             break
         except Exception as e:
             print(f"错误: {e}")
-            time.sleep(2)
+            time.sleep(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description='实时监控训练进度')
+    parser.add_argument('run_dir', nargs='?', default=None,
+                        help='训练目录（默认 runs/ 下最新的 red-alert 目录）')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='刷新间隔（秒）')
+    args = parser.parse_args()
+    monitor_training(args.run_dir, args.interval)
 
 if __name__ == "__main__":
-    monitor_training()
\ No newline at end of file
+    main()
\ No newline at end of file
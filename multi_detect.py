@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+多路视频检测 - 多个视频/直播源共享一个模型，批量推理
+"""
+
+import cv2
+import time
+import queue
+import argparse
+import threading
+from pathlib import Path
+
+
+def is_live_source(source):
+    """摄像头编号或网络流视为直播源"""
+    return source.isdigit() or source.startswith(('rtsp://', 'rtmp://', 'http://', 'https://'))
+
+
+class StreamReader(threading.Thread):
+    """
+    单路解码线程
+
+    解码后的帧放入有界队列。文件源在队列满时阻塞等待（不丢帧），
+    直播源在队列满时丢弃最旧的帧，保证处理的总是最新画面。
+    """
+
+    def __init__(self, stream_id, source, queue_size=8):
+        super().__init__(daemon=True)
+        self.stream_id = stream_id
+        self.source = source
+        self.live = is_live_source(source)
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.finished = threading.Event()
+        self.stop_event = threading.Event()
+
+        self.cap = cv2.VideoCapture(int(source) if source.isdigit() else str(Path(source).expanduser()))
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise IOError(f"无法打开视频源: {source}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        self.read_count = 0
+        self.dropped = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                item = (self.read_count, frame)
+                self.read_count += 1
+
+                if self.live:
+                    # 直播源：队列满时丢弃最旧的帧
+                    while True:
+                        try:
+                            self.frames.put_nowait(item)
+                            break
+                        except queue.Full:
+                            try:
+                                self.frames.get_nowait()
+                                self.dropped += 1
+                            except queue.Empty:
+                                pass
+                else:
+                    # 文件源：阻塞等待调度器消费（背压）
+                    while not self.stop_event.is_set():
+                        try:
+                            self.frames.put(item, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+        finally:
+            self.cap.release()
+            self.finished.set()
+
+    @property
+    def exhausted(self):
+        """解码结束且队列已取空"""
+        return self.finished.is_set() and self.frames.empty()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class StreamOutput:
+    """单路输出：标注视频 + 每帧检测结果文本"""
+
+    def __init__(self, output_dir, name, fps, size, save_video=True):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.writer = None
+        if save_video:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self.writer = cv2.VideoWriter(str(output_dir / f"{name}.mp4"), fourcc, fps, size)
+        self.txt = open(output_dir / f"{name}.txt", 'w')
+        self.processed = 0
+        self.detections = 0
+
+    def write(self, frame_index, result):
+        boxes = result.boxes
+        if boxes is not None:
+            for box, cls, conf in zip(boxes.xyxy.tolist(), boxes.cls.tolist(), boxes.conf.tolist()):
+                x1, y1, x2, y2 = box
+                self.txt.write(f"{frame_index} {int(cls)} {conf:.4f} "
+                               f"{x1:.1f} {y1:.1f} {x2:.1f} {y2:.1f}\n")
+                self.detections += 1
+        if self.writer is not None:
+            self.writer.write(result.plot())
+        self.processed += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+        self.txt.close()
+
+
+def next_batch(readers, batch_size, start, timeout=0.05):
+    """
+    轮询调度：从 start 开始每路最多取一帧，直到凑满一个批次
+
+    返回 ([(reader, frame_index, frame), ...], 下一轮起始位置)。
+    每路每轮只取一帧，保证各路公平；起始位置轮转，避免固定偏向第一路。
+    """
+    batch = []
+    n = len(readers)
+    deadline = time.perf_counter() + timeout
+    next_start = start
+
+    while len(batch) < batch_size:
+        got = False
+        for k in range(n):
+            position = (start + k) % n
+            try:
+                frame_index, frame = readers[position].frames.get_nowait()
+            except queue.Empty:
+                continue
+            batch.append((readers[position], frame_index, frame))
+            next_start = (position + 1) % n
+            got = True
+            if len(batch) >= batch_size:
+                break
+
+        # 已经有帧且短时间内凑不满，就不再等待，保证延迟
+        if not got:
+            if batch or time.perf_counter() > deadline:
+                break
+            if all(r.exhausted for r in readers):
+                break
+            time.sleep(0.002)
+
+    return batch, next_start
+
+
+def detect_streams(sources, model_path='runs/red-alert_20250901_001914/weights/best.pt',
+                   output_dir='runs/multi', batch_size=8, queue_size=8, imgsz=640,
+                   conf=0.25, save_video=True):
+    """多路并发检测"""
+    from ultralytics import YOLO
+
+    # 只加载一份模型，所有视频源共享
+    print("📦 加载模型...")
+    model = YOLO(model_path)
+
+    output_dir = Path(output_dir)
+    readers, outputs = [], {}
+    try:
+        for i, source in enumerate(sources):
+            reader = StreamReader(i, source, queue_size=queue_size)
+            readers.append(reader)
+            name = f"{i:02d}_{Path(source).stem if not source.isdigit() else 'cam' + source}"
+            outputs[i] = StreamOutput(output_dir, name, reader.fps,
+                                      (reader.width, reader.height), save_video)
+            print(f"🎬 [{i}] {source}: {reader.width}x{reader.height} @ {reader.fps:.0f}fps"
+                  f"{' (直播)' if reader.live else ''}")
+    except Exception:
+        # 解码线程尚未启动，已打开的视频源和输出文件需要在这里释放
+        for reader in readers:
+            reader.cap.release()
+        for output in outputs.values():
+            output.close()
+        raise
+
+    for reader in readers:
+        reader.start()
+
+    print(f"🚀 开始检测 {len(readers)} 路视频, 批次大小 {batch_size}, 按 Ctrl+C 停止")
+    start_time = time.time()
+    offset = 0
+    batches = 0
+
+    try:
+        while not all(r.exhausted for r in readers):
+            batch, offset = next_batch(readers, batch_size, offset)
+            if not batch:
+                continue
+
+            frames = [frame for _, _, frame in batch]
+            results = model(frames, imgsz=imgsz, conf=conf, verbose=False)
+
+            for (reader, frame_index, _), result in zip(batch, results):
+                outputs[reader.stream_id].write(frame_index, result)
+            batches += 1
+
+            if batches % 50 == 0:
+                elapsed = time.time() - start_time
+                done = sum(o.processed for o in outputs.values())
+                print(f"⏱️  {elapsed:.0f}s: 已处理 {done} 帧 ({done / elapsed:.1f} 帧/秒)")
+    except KeyboardInterrupt:
+        print("\n⏹️  停止检测")
+    finally:
+        for reader in readers:
+            reader.stop()
+        for output in outputs.values():
+            output.close()
+
+    # 统计
+    elapsed = time.time() - start_time
+    print("\n📊 各路统计:")
+    for reader in readers:
+        output = outputs[reader.stream_id]
+        print(f"  [{reader.stream_id}] {reader.source}: 处理 {output.processed} 帧, "
+              f"丢弃 {reader.dropped} 帧, 检测 {output.detections} 个目标")
+    total = sum(o.processed for o in outputs.values())
+    print(f"⏱️ 用时 {elapsed:.1f}s, 总吞吐 {total / max(elapsed, 1e-9):.1f} 帧/秒")
+    print(f"📁 结果保存在: {output_dir}/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多路视频检测（共享模型批量推理）')
+    parser.add_argument('sources', nargs='+',
+                        help='视频路径、摄像头编号或 rtsp/http 流地址')
+    parser.add_argument('--model', type=str,
+                        default='runs/red-alert_20250901_001914/weights/best.pt',
+                        help='模型路径')
+    parser.add_argument('--output', type=str, default='runs/multi',
+                        help='输出目录')
+    parser.add_argument('--batch', type=int, default=8,
+                        help='推理批次大小')
+    parser.add_argument('--queue-size', type=int, default=8,
+                        help='每路缓冲帧数（背压上限）')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='推理图像尺寸')
+    parser.add_argument('--conf', type=float, default=0.25,
+                        help='置信度阈值')
+    parser.add_argument('--no-video', action='store_true',
+                        help='不保存标注视频，只保存检测结果文本')
+
+    args = parser.parse_args()
+
+    detect_streams(args.sources, args.model,
+                   output_dir=args.output,
+                   batch_size=args.batch,
+                   queue_size=args.queue_size,
+                   imgsz=args.imgsz,
+                   conf=args.conf,
+                   save_video=not args.no_video)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+YOLO 红色警戒 - 统一命令行入口
+
+    python ra.py <命令> [参数...]
+
+本文件只导入标准库；各子命令在执行时才导入自己需要的依赖，
+所以 `python ra.py --help` 等命令几乎瞬间返回。
+"""
+
+import sys
+import runpy
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+DEFAULT_MODEL = 'runs/red-alert_20250901_001914/weights/best.pt'
+
+# 转发给已有脚本的子命令：命令 -> (脚本, 说明)
+SCRIPTS = {
+    'train': ('scripts/train.py', '训练模型（含 --teacher 蒸馏压缩模式）'),
+    'train-quick': ('train_quick.py', '快速训练（Roboflow 数据集）'),
+    'test': ('test_model.py', '在测试集上评估模型'),
+    'video': ('test_video.py', '检测视频并保存结果'),
+    'live': ('live_detect.py', '实时显示检测结果'),
+    'multi': ('multi_detect.py', '多路视频共享模型检测'),
+    'monitor': ('monitor.py', '实时监控训练进度'),
+    'demo': ('scripts/demo.py', 'Gradio Web 演示'),
+    'split': ('scripts/split_dataset.py', '分割数据集'),
+    'dedup': ('scripts/phash_index.py', '检查数据集中的近重复图片'),
+    'mine': ('scripts/mine_hard_examples.py', '难例挖掘：从未标注录像中挑选待标注帧'),
+    'bench-startup': ('scripts/bench_startup.py', '测量各命令的冷启动时间'),
+}
+
+
+def run_script(script, argv):
+    """像 `python script ...` 一样执行脚本"""
+    path = ROOT / script
+    sys.argv = [str(path)] + list(argv)
+    sys.path.insert(0, str(path.parent))
+    runpy.run_path(str(path), run_name='__main__')
+
+
+def cmd_compile(args):
+    """编译并缓存模型"""
+    from model_cache import compile_model
+
+    compile_model(args.model, args.imgsz, args.cache_dir)
+
+
+def cmd_predict(args):
+    """
+    图片推理
+
+    默认使用缓存的 TorchScript 模型（不导入 ultralytics），
+    --no-cache 时走 ultralytics 的完整流程。
+    """
+    import cv2
+
+    images = []
+    for source in args.sources:
+        path = Path(source).expanduser()
+        if path.is_dir():
+            images += sorted(p for p in path.iterdir()
+                             if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.bmp', '.webp'))
+        else:
+            images.append(path)
+
+    if args.no_cache:
+        from ultralytics import YOLO
+
+        model = YOLO(args.model)
+        names = model.names
+
+        def predict(image):
+            result = model(image, imgsz=args.imgsz, conf=args.conf, iou=args.iou,
+                           device='cpu', verbose=False)[0]
+            boxes = result.boxes
+            return [(*box, score, int(cls)) for box, score, cls in
+                    zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())]
+    else:
+        from model_cache import load_compiled
+
+        model = load_compiled(args.model, args.imgsz, args.cache_dir)
+        names = model.names
+
+        def predict(image):
+            return model.predict(image, conf=args.conf, iou=args.iou)
+
+    if args.save_dir:
+        Path(args.save_dir).mkdir(parents=True, exist_ok=True)
+
+    for path in images:
+        image = cv2.imread(str(path))
+        if image is None:
+            print(f"❌ 无法读取: {path}")
+            continue
+        detections = predict(image)
+        print(f"🎯 {path.name}: {len(detections)} 个目标")
+        for x1, y1, x2, y2, score, cls in detections:
+            print(f"  {names.get(cls, cls)} {score:.2f} [{x1:.0f}, {y1:.0f}, {x2:.0f}, {y2:.0f}]")
+            if args.save_dir:
+                cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
+                cv2.putText(image, f"{names.get(cls, cls)} {score:.2f}",
+                            (int(x1), max(int(y1) - 5, 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        if args.save_dir:
+            cv2.imwrite(str(Path(args.save_dir) / path.name), image)
+
+    if args.save_dir:
+        print(f"✅ 结果保存在: {args.save_dir}/")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='ra.py',
+        description='YOLO 红色警戒单位识别 - 统一命令行入口',
+    )
+    subparsers = parser.add_subparsers(dest='command', metavar='<命令>')
+
+    for name, (script, help_text) in SCRIPTS.items():
+        # 参数原样转发给脚本，`ra.py train --help` 显示脚本自己的帮助
+        sub = subparsers.add_parser(name, help=help_text, add_help=False)
+        sub.set_defaults(script=script)
+
+    model_args = argparse.ArgumentParser(add_help=False)
+    model_args.add_argument('--model', type=str, default=DEFAULT_MODEL, help='模型路径')
+    model_args.add_argument('--imgsz', type=int, default=640, help='推理图像尺寸')
+    model_args.add_argument('--cache-dir', type=str, default='.cache/models',
+                            help='编译模型缓存目录')
+
+    sub = subparsers.add_parser('compile', parents=[model_args],
+                                help='导出并缓存冻结的 TorchScript 模型')
+    sub.set_defaults(func=cmd_compile)
+
+    sub = subparsers.add_parser('predict', parents=[model_args],
+                                help='图片推理（默认使用编译缓存）')
+    sub.add_argument('sources', nargs='+', help='图片或图片目录')
+    sub.add_argument('--conf', type=float, default=0.25, help='置信度阈值')
+    sub.add_argument('--iou', type=float, default=0.45, help='NMS IoU 阈值')
+    sub.add_argument('--save-dir', type=str, default=None, help='保存标注图片的目录')
+    sub.add_argument('--no-cache', action='store_true', help='不使用编译缓存')
+    sub.set_defaults(func=cmd_predict)
+
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    sys.path.insert(0, str(ROOT))
+
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return
+    if hasattr(args, 'script'):
+        run_script(args.script, rest)
+        return
+    if rest:
+        parser.error(f"无法识别的参数: {' '.join(rest)}")
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+冷启动基准 - 测量统一命令行各子命令从启动到退出的时间
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(command, repeat):
+    """运行命令 repeat 次，返回耗时中位数（秒）；命令失败返回 None"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            print(f"❌ 命令失败: {' '.join(command)}")
+            print(result.stderr.decode(errors='replace')[-500:])
+            return None
+        times.append(elapsed)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷启动基准测试')
+    parser.add_argument('--model', type=str,
+                        default='runs/red-alert_20250901_001914/weights/best.pt',
+                        help='模型路径')
+    parser.add_argument('--image', type=str, default=None,
+                        help='测试图片（默认取测试集第一张）')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='每个命令重复次数')
+    parser.add_argument('--skip-predict', action='store_true',
+                        help='只测 --help 类命令，不加载模型')
+
+    args = parser.parse_args()
+
+    python = sys.executable
+    ra = str(ROOT / 'ra.py')
+
+    cases = [
+        ('python（空解释器）', [python, '-c', 'pass']),
+        ('ra.py --help', [python, ra, '--help']),
+    ]
+    for command in ('train', 'test', 'video', 'live', 'multi', 'demo', 'split'):
+        cases.append((f"ra.py {command} --help", [python, ra, command, '--help']))
+
+    if not args.skip_predict:
+        image = args.image
+        if image is None:
+            images = sorted((ROOT / 'datasets/red-alert/test/images').glob('*.jpg'))
+            if not images:
+                parser.error("没有找到测试图片，请用 --image 指定")
+            image = str(images[0])
+
+        # 先编译一次，保证下面测的是缓存命中的情况
+        print("🔨 准备编译缓存...")
+        subprocess.run([python, ra, 'compile', '--model', args.model], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL)
+
+        cases += [
+            ('predict（ultralytics）', [python, ra, 'predict', image, '--model', args.model,
+                                       '--no-cache']),
+            ('predict（编译缓存）', [python, ra, 'predict', image, '--model', args.model]),
+        ]
+
+    print(f"⏱️  每个命令运行 {args.repeat} 次，取中位数\n")
+    print(f"{'命令':<32} {'耗时(s)':>8}")
+    print("-" * 42)
+    for name, command in cases:
+        seconds = measure(command, args.repeat)
+        if seconds is not None:
+            print(f"{name:<32} {seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
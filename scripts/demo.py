@@ -3,18 +3,21 @@
 YOLO 红色警戒单位识别 - Gradio Web演示
 """
 
-import gradio as gr
-import torch
-from ultralytics import YOLO
 from PIL import Image
-import numpy as np
 import argparse
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from telemetry import telemetry, add_arguments, setup_from_args
+
 
 class YOLODemo:
     def __init__(self, model_path):
         """初始化演示"""
+        import torch
+        from ultralytics import YOLO
+        
         self.device = 'mps' if torch.backends.mps.is_available() else 'cpu'
         print(f"🔧 使用设备: {self.device}")
         
@@ -40,19 +43,24 @@ class YOLODemo:
             return None, "请上传图片"
         
         # 运行推理
-        results = self.model(
-            image,
-            conf=conf_threshold,
-            iou=iou_threshold,
-            device=self.device
-        )
+        with telemetry.span('infer') as span:
+            results = self.model(
+                image,
+                conf=conf_threshold,
+                iou=iou_threshold,
+                device=self.device
+            )
+        telemetry.observe_speed(results[0].speed, span.start)
         
         # 绘制结果
-        annotated = results[0].plot()
+        with telemetry.span('plot'):
+            annotated = results[0].plot()
         
         # 统计检测结果
         detections = results[0].boxes
         stats = self._get_stats(detections)
+        telemetry.count('images')
+        telemetry.count('detections', len(detections) if detections is not None else 0)
         
         return Image.fromarray(annotated), stats
     
@@ -92,22 +100,29 @@ class YOLODemo:
         
         for file in files:
             # 打开图片
-            image = Image.open(file.name)
+            with telemetry.span('decode'):
+                image = Image.open(file.name)
+                image.load()
             
             # 运行检测
-            results = self.model(
-                image,
-                conf=conf_threshold,
-                iou=iou_threshold,
-                device=self.device
-            )
+            with telemetry.span('infer') as span:
+                results = self.model(
+                    image,
+                    conf=conf_threshold,
+                    iou=iou_threshold,
+                    device=self.device
+                )
+            telemetry.observe_speed(results[0].speed, span.start)
             
             # 绘制结果
-            annotated = results[0].plot()
-            results_images.append(Image.fromarray(annotated))
+            with telemetry.span('plot'):
+                annotated = results[0].plot()
+                results_images.append(Image.fromarray(annotated))
             
             # 统计
             detections = results[0].boxes
+            telemetry.count('images')
+            telemetry.count('detections', len(detections) if detections is not None else 0)
             stats = self._get_stats(detections)
             all_stats.append(f"**{Path(file.name).name}**\n{stats}")
         
@@ -117,6 +132,8 @@ class YOLODemo:
 
 def create_interface(model_path):
     """创建Gradio界面"""
+    import gradio as gr
+    
     demo = YOLODemo(model_path)
     
     # 单张图片检测
@@ -191,6 +208,7 @@ def main():
                         help='端口号')
     parser.add_argument('--share', action='store_true',
                         help='创建公共链接')
+    add_arguments(parser)
     
     args = parser.parse_args()
     
@@ -200,6 +218,9 @@ def main():
         print("请先训练模型或指定正确的模型路径")
         return
     
+    # 分阶段计时（--metrics-port 提供 Prometheus 接口）
+    setup_from_args(args)
+    
     # 创建并启动界面
     app = create_interface(args.model)
     
@@ -212,6 +233,8 @@ def main():
         share=args.share,
         favicon_path=None,
     )
+    
+    telemetry.finish(args.profile)
 
 
 if __name__ == '__main__':
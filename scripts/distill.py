@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+知识蒸馏 - 在学生模型的检测损失上叠加教师模型的输出蒸馏项
+
+YOLOv8 各尺寸的检测头结构相同（步长 8/16/32，reg_max=16），同一张图片
+在同一 imgsz 下教师和学生输出的每个锚点一一对应，可以逐锚点蒸馏：
+
+  - 分类：学生的类别 logits 拟合教师的 sigmoid 概率（逐类别伯努利 KL）
+  - 框：学生的 DFL 分布拟合教师的分布（KL 散度），按教师的最高类别概率
+    加权，只在教师认为有目标的位置起作用
+
+蒸馏项分别并入 cls_loss 和 dfl_loss，训练日志和验证流程不需要改动；
+每个 epoch 结束单独打印蒸馏项的平均值。
+"""
+
+import torch
+import torch.nn.functional as F
+from ultralytics import YOLO
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils.loss import v8DetectionLoss
+from ultralytics.utils.torch_utils import de_parallel
+
+
+class DistillationLoss(v8DetectionLoss):
+    """v8DetectionLoss + 教师输出蒸馏"""
+
+    def __init__(self, model, teacher, weight=1.0, temperature=2.0):
+        super().__init__(model)
+        self.teacher = teacher
+        self.weight = weight
+        self.temperature = temperature
+        self.kd_sum = 0.0
+        self.kd_count = 0
+
+    def _flatten(self, feats):
+        """各层输出拼成 (批次, reg_max*4 + nc, 锚点数) 后拆成框分布和类别 logits"""
+        b = feats[0].shape[0]
+        x = torch.cat([xi.view(b, self.no, -1) for xi in feats], 2)
+        return x.split((self.reg_max * 4, self.nc), 1)
+
+    def distill(self, feats, teacher_feats):
+        """返回 (分类蒸馏项, 框蒸馏项)"""
+        t = self.temperature
+        s_box, s_cls = self._flatten(feats)
+        t_box, t_cls = self._flatten(teacher_feats)
+        s_box, s_cls, t_box, t_cls = s_box.float(), s_cls.float(), t_box.float(), t_cls.float()
+
+        # 分类：软标签 BCE 减去教师自身的熵（即伯努利 KL，完全一致时为 0），
+        # 按教师概率总和归一化（与 target_scores_sum 对应）
+        t_prob = (t_cls / t).sigmoid()
+        bce = F.binary_cross_entropy_with_logits(s_cls / t, t_prob, reduction='sum')
+        entropy = F.binary_cross_entropy_with_logits(t_cls / t, t_prob, reduction='sum')
+        cls_kd = (bce - entropy) * t * t / t_prob.sum().clamp(min=1.0)
+
+        # 框：每条边的 DFL 分布做 KL，按教师前景概率加权
+        b, _, a = s_box.shape
+        s_log = F.log_softmax(s_box.view(b, 4, self.reg_max, a) / t, dim=2)
+        t_log = F.log_softmax(t_box.view(b, 4, self.reg_max, a) / t, dim=2)
+        kl = (t_log.exp() * (t_log - s_log)).sum(2).mean(1) * t * t  # (批次, 锚点)
+        weight = t_cls.sigmoid().amax(1)
+        box_kd = (kl * weight).sum() / weight.sum().clamp(min=1.0)
+        return cls_kd, box_kd
+
+    def __call__(self, preds, batch):
+        loss, loss_items = super().__call__(preds, batch)
+        feats = preds[1] if isinstance(preds, tuple) else preds
+
+        # 教师处于 eval 模式，输出为 (推理结果, 各层原始输出)
+        with torch.no_grad():
+            teacher_feats = self.teacher(batch['img'])[1]
+
+        cls_kd, box_kd = self.distill(feats, teacher_feats)
+        cls_kd = cls_kd * self.weight * self.hyp.cls
+        box_kd = box_kd * self.weight * self.hyp.dfl
+        batch_size = feats[0].shape[0]
+
+        kd = torch.stack([torch.zeros_like(cls_kd), cls_kd, box_kd]).to(loss.dtype)
+        self.kd_sum += (cls_kd + box_kd).detach().item()
+        self.kd_count += 1
+        return loss + kd * batch_size, loss_items + kd.detach()
+
+    def pop_average(self):
+        """取出并清零自上次调用以来的平均蒸馏损失"""
+        average = self.kd_sum / max(self.kd_count, 1)
+        self.kd_sum, self.kd_count = 0.0, 0
+        return average
+
+
+def load_teacher(path, device):
+    """加载冻结的教师检测模型"""
+    teacher = YOLO(path).model.to(device).float().eval()
+    for p in teacher.parameters():
+        p.requires_grad_(False)
+    return teacher
+
+
+def check_compatible(student, teacher):
+    """教师和学生的检测头必须逐锚点对应"""
+    s, t = de_parallel(student).model[-1], teacher.model[-1]
+    if s.nc != t.nc or s.reg_max != t.reg_max or s.stride.tolist() != t.stride.tolist():
+        raise ValueError(f"教师与学生的检测头不一致: 类别 {t.nc}/{s.nc}, "
+                         f"reg_max {t.reg_max}/{s.reg_max}, 步长 {t.stride.tolist()}/{s.stride.tolist()}")
+
+
+def make_trainer(teacher_path, weight=1.0, temperature=2.0, base=None):
+    """
+    生成带教师蒸馏的 DetectionTrainer 子类
+
+    蒸馏损失在 EMA 建好之后才挂到训练模型上：EMA 和保存的权重里都不含
+    教师模型，best.pt 仍是普通的 YOLO 检测模型。
+    """
+
+    class DistillationTrainer(base or DetectionTrainer):
+        def _setup_train(self, *args, **kwargs):
+            super()._setup_train(*args, **kwargs)
+            teacher = load_teacher(teacher_path, self.device)
+            check_compatible(self.model, teacher)
+            model = de_parallel(self.model)
+            model.criterion = DistillationLoss(model, teacher, weight, temperature)
+            print(f"🧑‍🏫 教师蒸馏: {teacher_path}, 权重 {weight}, 温度 {temperature}")
+
+    return DistillationTrainer
+
+
+def add_callbacks(model):
+    """每个 epoch 结束打印平均蒸馏损失，并记录到 trainer.kd_history"""
+
+    def on_train_epoch_end(trainer):
+        criterion = getattr(de_parallel(trainer.model), 'criterion', None)
+        if isinstance(criterion, DistillationLoss):
+            average = criterion.pop_average()
+            trainer.kd_history = getattr(trainer, 'kd_history', []) + [average]
+            print(f"🧑‍🏫 蒸馏损失: {average:.4f}")
+
+    model.add_callback('on_train_epoch_end', on_train_epoch_end)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+压缩图片缓存 - 固定内存预算、所有 dataloader 进程共享的训练图片缓存
+
+--cache ram 会在每个进程里保存完整解码后的图片，数据集一大就会耗尽内存。
+这里把缩放后的图片编码成 JPEG/PNG 字节，写进一块共享内存环形缓冲区：
+
+  - 内存占用固定为 budget，写满后从最旧的数据开始覆盖（FIFO 淘汰）
+  - 所有 worker 读写同一块区域，任一进程解码过的图片其它进程都能命中
+  - 命中时只需解码压缩字节，省掉读盘和缩放
+  - 统计命中率、淘汰次数和平均解码耗时
+"""
+
+import re
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+# 头部计数器下标
+CURSOR, HITS, MISSES, INSERTS, EVICTIONS, DECODE_NS, REJECTED = range(7)
+HEADER_SIZE = 8
+
+# 每张图片的索引字段：逻辑起点、长度、原始高、原始宽、是否有效
+START, LENGTH, H0, W0, VALID = range(5)
+
+
+def parse_size(text):
+    """'2G' / '512M' / '1048576' -> 字节数"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)I?B?\s*', str(text).upper())
+    if not match:
+        raise ValueError(f"无法解析的大小: {text}")
+    value, unit = match.groups()
+    return int(float(value) * 1024 ** ' KMGT'.index(unit or ' '))
+
+
+def _attach(name):
+    """
+    附加到已有共享内存
+
+    worker 与主进程共用同一个 resource_tracker，重复登记不会导致提前删除；
+    这里不能反登记，否则主进程 unlink 时 tracker 会报错。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedImageCache:
+    """
+    共享内存中的压缩图片环形缓存
+
+    数据区按逻辑偏移（单调递增的游标）顺序写入，物理位置为 偏移 % budget。
+    条目的起点落后游标超过 budget 即视为已被覆盖。所有读写都在一把进程
+    锁内完成内存拷贝，解码和编码在锁外进行。
+    """
+
+    def __init__(self, num_images, budget, quality=100):
+        self.num_images = num_images
+        self.budget = int(budget)
+        self.quality = quality
+        self.lock = multiprocessing.Lock()
+        self._owner = True
+
+        meta_bytes = (HEADER_SIZE + num_images * 5) * 8
+        self._data_shm = shared_memory.SharedMemory(create=True, size=self.budget)
+        self._meta_shm = shared_memory.SharedMemory(create=True, size=meta_bytes)
+        self._map()
+        self.header[:] = 0
+        self.index[:] = 0
+
+    def _map(self):
+        self.data = np.ndarray((self.budget,), dtype=np.uint8, buffer=self._data_shm.buf)
+        meta = np.ndarray((HEADER_SIZE + self.num_images * 5,), dtype=np.int64,
+                          buffer=self._meta_shm.buf)
+        self.header = meta[:HEADER_SIZE]
+        self.index = meta[HEADER_SIZE:].reshape(self.num_images, 5)
+
+    # spawn 方式启动的 worker 通过名字重新附加共享内存
+    def __getstate__(self):
+        return {
+            'num_images': self.num_images,
+            'budget': self.budget,
+            'quality': self.quality,
+            'lock': self.lock,
+            'data_name': self._data_shm.name,
+            'meta_name': self._meta_shm.name,
+        }
+
+    def __setstate__(self, state):
+        self.num_images = state['num_images']
+        self.budget = state['budget']
+        self.quality = state['quality']
+        self.lock = state['lock']
+        self._owner = False
+        self._data_shm = _attach(state['data_name'])
+        self._meta_shm = _attach(state['meta_name'])
+        self._map()
+
+    def encode(self, im):
+        """
+        quality >= 100 时用无损 PNG，否则用 JPEG
+
+        JPEG 有损：命中时拿到的是重新压缩过的像素，未命中时是原图，
+        训练数据会随缓存状态变化，所以默认使用无损。
+        """
+        if self.quality >= 100:
+            ok, buf = cv2.imencode('.png', im, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        else:
+            ok, buf = cv2.imencode('.jpg', im, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        # OpenCV 4.x 返回 (N, 1)，展平后才能写入一维缓冲区
+        return buf.reshape(-1) if ok else None
+
+    def get(self, i):
+        """命中返回 (图像, (原始高, 原始宽))，未命中返回 None"""
+        with self.lock:
+            row = self.index[i]
+            if not row[VALID]:
+                self.header[MISSES] += 1
+                return None
+            start, length = int(row[START]), int(row[LENGTH])
+            if self.header[CURSOR] - start > self.budget:
+                # 已被后写入的数据覆盖（淘汰已在 put 中计数）
+                row[VALID] = 0
+                self.header[MISSES] += 1
+                return None
+            pos = start % self.budget
+            payload = self.data[pos:pos + length].copy()
+            h0, w0 = int(row[H0]), int(row[W0])
+            self.header[HITS] += 1
+
+        t = time.perf_counter_ns()
+        im = cv2.imdecode(payload, cv2.IMREAD_UNCHANGED)
+        elapsed = time.perf_counter_ns() - t
+        with self.lock:
+            self.header[DECODE_NS] += elapsed
+        if im is None:
+            return None
+        if im.ndim == 2:
+            im = im[..., None]
+        return im, (h0, w0)
+
+    def put(self, i, im, hw0):
+        """编码并写入一张图片，超出预算的单张图片直接放弃"""
+        payload = self.encode(im)
+        if payload is None or len(payload) > self.budget:
+            with self.lock:
+                self.header[REJECTED] += 1
+            return False
+        length = len(payload)
+
+        with self.lock:
+            cursor = int(self.header[CURSOR])
+            pos = cursor % self.budget
+            if pos + length > self.budget:
+                # 条目不跨越缓冲区末尾，直接从头开始
+                cursor += self.budget - pos
+                pos = 0
+            # 写入后游标前进到 cursor + length，起点落后超过 budget 的条目被覆盖
+            valid = self.index[:, VALID] == 1
+            starts = self.index[:, START]
+            evicted = valid & (starts < cursor + length - self.budget)
+            self.index[evicted, VALID] = 0
+            self.header[EVICTIONS] += int(evicted.sum())
+
+            self.data[pos:pos + length] = payload
+            self.header[CURSOR] = cursor + length
+            self.index[i] = (cursor, length, hw0[0], hw0[1], 1)
+            self.header[INSERTS] += 1
+        return True
+
+    def stats(self):
+        """命中率、淘汰次数、平均解码耗时和已用内存"""
+        with self.lock:
+            header = self.header.copy()
+            valid = self.index[:, VALID].astype(bool)
+            starts = self.index[valid, START]
+            lengths = self.index[valid, LENGTH]
+        alive = header[CURSOR] - starts <= self.budget
+        hits, misses = int(header[HITS]), int(header[MISSES])
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'inserts': int(header[INSERTS]),
+            'evictions': int(header[EVICTIONS]),
+            'rejected': int(header[REJECTED]),
+            'decode_ms': header[DECODE_NS] / max(hits, 1) / 1e6,
+            'cached_images': int(alive.sum()),
+            'used_bytes': int(lengths[alive].sum()),
+            'budget_bytes': self.budget,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"命中率 {s['hit_rate']:.1%} ({s['hits']}/{s['hits'] + s['misses']}), "
+                f"缓存 {s['cached_images']}/{self.num_images} 张, "
+                f"{s['used_bytes'] / 2 ** 20:.0f}/{s['budget_bytes'] / 2 ** 20:.0f} MB, "
+                f"淘汰 {s['evictions']}, 平均解码 {s['decode_ms']:.2f}ms")
+
+    def close(self):
+        """关闭映射；创建者同时删除共享内存"""
+        self.data = self.header = self.index = None
+        self._data_shm.close()
+        self._meta_shm.close()
+        if self._owner:
+            self._data_shm.unlink()
+            self._meta_shm.unlink()
+
+
+class CompressedCacheDataset(YOLODataset):
+    """从 SharedImageCache 读取图片的 YOLODataset，未命中时读盘并写回缓存"""
+
+    shared_cache = None
+
+    def load_image(self, i, rect_mode=True):
+        # mosaic 缓冲区里的图片直接返回
+        if self.ims[i] is not None:
+            return self.ims[i], self.im_hw0[i], self.im_hw[i]
+
+        cached = self.shared_cache.get(i)
+        if cached is None:
+            im, hw0, hw = super().load_image(i, rect_mode)
+            self.shared_cache.put(i, im, hw0)
+            return im, hw0, hw
+
+        im, hw0 = cached
+        if self.augment:
+            # 与父类相同的 mosaic 缓冲区维护
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, hw0, im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, hw0, im.shape[:2]
+
+
+def make_trainer(budget, quality=100, base=None):
+    """生成训练集使用共享压缩缓存的 DetectionTrainer 子类（base 可指定其它父类）"""
+
+    class CompressedCacheTrainer(base or DetectionTrainer):
+        def build_dataset(self, img_path, mode='train', batch=None):
+            dataset = super().build_dataset(img_path, mode, batch)
+            if mode == 'train':
+                dataset.__class__ = CompressedCacheDataset
+                dataset.shared_cache = SharedImageCache(len(dataset.im_files), budget, quality)
+                print(f"🗜️ 压缩缓存: {len(dataset.im_files)} 张图片, "
+                      f"预算 {budget / 2 ** 20:.0f} MB, 质量 {quality}")
+            return dataset
+
+    return CompressedCacheTrainer
+
+
+def add_callbacks(model):
+    """每个 epoch 结束打印缓存统计，训练结束释放共享内存"""
+
+    def on_train_epoch_end(trainer):
+        cache = getattr(trainer.train_loader.dataset, 'shared_cache', None)
+        if cache is not None:
+            print(f"🗜️ 压缩缓存: {cache.summary()}")
+
+    def on_train_end(trainer):
+        cache = getattr(trainer.train_loader.dataset, 'shared_cache', None)
+        if cache is not None:
+            print(f"🗜️ 压缩缓存: {cache.summary()}")
+            cache.close()
+
+    model.add_callback('on_train_epoch_end', on_train_epoch_end)
+    model.add_callback('on_train_end', on_train_end)
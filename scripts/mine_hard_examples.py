@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+难例挖掘 - 用当前模型在未标注录像上并行推理，挑出最不确定的帧送去标注
+
+每个视频按时间切成若干段，由进程池并行处理（每个进程只加载一次模型）。
+每帧的不确定度由两部分组成：
+  - 低置信度：置信度接近 0.5 的框越多，分数越高
+  - 不一致：原图和水平翻转图的检测结果对不上的框
+最终按分数取 top-K，导出图片和预填的 YOLO / LabelMe 标注。
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import heapq
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from video_source import VideoSource
+
+VIDEO_SUFFIXES = ('.mp4', '.mkv', '.avi', '.mov', '.flv', '.webm')
+
+# 每个工作进程各自持有的模型
+_worker = {}
+
+
+def init_worker(model_path, imgsz, device, threads):
+    """进程池初始化：限制每个进程的线程数，加载一次模型"""
+    import torch
+    from ultralytics import YOLO
+
+    torch.set_num_threads(threads)
+    _worker['model'] = YOLO(model_path)
+    _worker['imgsz'] = imgsz
+    _worker['device'] = device
+
+
+def iou(a, b):
+    """两个 xyxy 框的 IoU"""
+    iw = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    ih = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def detect(frame, conf):
+    """返回 [(x1, y1, x2, y2, 置信度, 类别), ...]"""
+    result = _worker['model'](frame, conf=conf, imgsz=_worker['imgsz'],
+                              device=_worker['device'], verbose=False)[0]
+    boxes = result.boxes
+    if boxes is None:
+        return []
+    return [(*box, score, int(cls)) for box, score, cls in
+            zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())]
+
+
+def uncertainty(frame, low, high, match_iou=0.5):
+    """
+    计算一帧的不确定度
+
+    返回 (分数, 原图检测结果)。只统计置信度不低于 low 的框；
+    置信度在 [low, high] 之间的框按离 0.5 的距离加分，
+    翻转前后无法配对或类别不同的框各加 1 分。
+    """
+    import numpy as np
+
+    boxes = detect(frame, low)
+    width = frame.shape[1]
+    flipped = [(width - x2, y1, width - x1, y2, score, cls)
+               for x1, y1, x2, y2, score, cls in detect(np.ascontiguousarray(frame[:, ::-1]), low)]
+
+    score = 0.0
+    for box in boxes:
+        if box[4] <= high:
+            score += 1.0 - abs(box[4] - 0.5) * 2
+
+    # 贪心配对原图和翻转图的框
+    unmatched = list(flipped)
+    for box in sorted(boxes, key=lambda b: -b[4]):
+        best, best_iou = None, match_iou
+        for other in unmatched:
+            overlap = iou(box, other)
+            if overlap >= best_iou:
+                best, best_iou = other, overlap
+        if best is None:
+            score += 1.0
+        else:
+            unmatched.remove(best)
+            if best[5] != box[5]:
+                score += 1.0
+    score += len(unmatched)
+    return score, boxes
+
+
+def mine_segment(video, start, end, every, low, high, topk):
+    """处理一个视频片段，返回 (该段 top-K 候选, 分析帧数, 处理时长)"""
+    candidates = []
+    analysed = 0
+    last_time = start
+    with VideoSource(video, every=every, start=start, end=end) as source:
+        for index, timestamp, frame in source:
+            # 片段终点不含在内，边界帧只由下一段处理
+            if end is not None and timestamp >= end:
+                break
+            analysed += 1
+            last_time = timestamp
+            score, boxes = uncertainty(frame, low, high)
+            if score <= 0:
+                continue
+            item = (score, timestamp, index, boxes)
+            if len(candidates) < topk:
+                heapq.heappush(candidates, item)
+            elif item > candidates[0]:
+                heapq.heapreplace(candidates, item)
+    # 时长未知的视频按最后分析到的时间计算
+    seconds = (end if end is not None else last_time) - start
+    return [(video, *item) for item in candidates], analysed, seconds
+
+
+def find_videos(sources):
+    """展开视频文件和目录"""
+    videos = []
+    for source in sources:
+        path = Path(source).expanduser()
+        if path.is_dir():
+            videos += sorted(p for p in path.rglob('*') if p.suffix.lower() in VIDEO_SUFFIXES)
+        elif path.exists():
+            videos.append(path)
+        else:
+            print(f"⚠️ 找不到: {source}")
+    return videos
+
+
+def plan_segments(videos, segment):
+    """把每个视频按 segment 秒切成任务"""
+    tasks = []
+    for video in videos:
+        with VideoSource(video, backend='opencv') as source:
+            duration = source.duration
+        if not duration:
+            print(f"⚠️ 无法获取时长，整段处理: {video}")
+            tasks.append((str(video), 0.0, None))
+            continue
+        start = 0.0
+        while start < duration:
+            tasks.append((str(video), start, min(start + segment, duration)))
+            start += segment
+    return tasks
+
+
+def select(candidates, topk, min_gap):
+    """按分数取 top-K，同一视频内相邻入选帧至少相隔 min_gap 秒"""
+    chosen = []
+    taken = {}
+    for video, score, timestamp, index, boxes in sorted(candidates, key=lambda c: -c[1]):
+        times = taken.setdefault(video, [])
+        if any(abs(timestamp - t) < min_gap for t in times):
+            continue
+        times.append(timestamp)
+        chosen.append((video, score, timestamp, index, boxes))
+        if len(chosen) >= topk:
+            break
+    return chosen
+
+
+def export(chosen, output_dir, names, label_conf, formats):
+    """重新解码入选帧，导出图片、YOLO 标注、LabelMe 标注和排名表"""
+    import cv2
+
+    image_dir = output_dir / 'images'
+    label_dir = output_dir / 'labels'
+    image_dir.mkdir(parents=True, exist_ok=True)
+    if 'yolo' in formats:
+        label_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    for rank, (video, score, timestamp, index, boxes) in enumerate(chosen, 1):
+        # 入选帧很少，逐个定位重新解码比在工作进程里缓存图片更省内存
+        frame = None
+        with VideoSource(video, start=timestamp, backend='opencv') as source:
+            for _, _, frame in source:
+                frame = frame.copy()
+                break
+        if frame is None:
+            print(f"⚠️ 无法读取帧: {video} @ {timestamp:.1f}s")
+            continue
+
+        h, w = frame.shape[:2]
+        stem = f"{Path(video).stem}_{index:07d}"
+        image_path = image_dir / f"{stem}.jpg"
+        cv2.imwrite(str(image_path), frame)
+
+        keep = [b for b in boxes if b[4] >= label_conf]
+        if 'yolo' in formats:
+            lines = [f"{cls} {(x1 + x2) / 2 / w:.6f} {(y1 + y2) / 2 / h:.6f} "
+                     f"{(x2 - x1) / w:.6f} {(y2 - y1) / h:.6f}"
+                     for x1, y1, x2, y2, _, cls in keep]
+            (label_dir / f"{stem}.txt").write_text("\n".join(lines) + ("\n" if lines else ""))
+        if 'labelme' in formats:
+            shapes = [{
+                'label': names.get(cls, str(cls)),
+                'points': [[x1, y1], [x2, y2]],
+                'group_id': None,
+                'description': f"conf={score_:.3f}",
+                'shape_type': 'rectangle',
+                'flags': {},
+            } for x1, y1, x2, y2, score_, cls in keep]
+            labelme = {
+                'version': '5.4.0',
+                'flags': {},
+                'shapes': shapes,
+                'imagePath': image_path.name,
+                'imageData': None,
+                'imageHeight': h,
+                'imageWidth': w,
+            }
+            (image_dir / f"{stem}.json").write_text(json.dumps(labelme, ensure_ascii=False, indent=2))
+
+        rows.append({'rank': rank, 'image': image_path.name, 'score': f"{score:.3f}",
+                     'video': video, 'time': f"{timestamp:.2f}", 'boxes': len(keep)})
+
+    with open(output_dir / 'ranking.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['rank', 'image', 'score', 'video', 'time', 'boxes'])
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='难例挖掘：从未标注录像中挑选最值得标注的帧')
+    parser.add_argument('sources', nargs='+',
+                        help='视频文件或包含视频的目录')
+    parser.add_argument('--model', type=str,
+                        default='runs/red-alert_20250901_001914/weights/best.pt',
+                        help='模型路径')
+    parser.add_argument('--output', type=str, default=None,
+                        help='输出目录（默认 datasets/mined/<时间>）')
+    parser.add_argument('--every', type=float, default=1.0,
+                        help='每隔多少秒分析一帧')
+    parser.add_argument('--segment', type=float, default=300,
+                        help='每个任务处理的视频时长（秒）')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='进程数')
+    parser.add_argument('--threads', type=int, default=2,
+                        help='每个进程的推理线程数')
+    parser.add_argument('--device', type=str, default='cpu',
+                        help='推理设备')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='推理图像尺寸')
+    parser.add_argument('--low', type=float, default=0.1,
+                        help='参与评分的最低置信度')
+    parser.add_argument('--high', type=float, default=0.6,
+                        help='高于此置信度的框视为确定')
+    parser.add_argument('--label-conf', type=float, default=0.25,
+                        help='写入预填标注的最低置信度')
+    parser.add_argument('--topk', type=int, default=200,
+                        help='导出的帧数')
+    parser.add_argument('--min-gap', type=float, default=2.0,
+                        help='同一视频入选帧的最小间隔（秒）')
+    parser.add_argument('--format', type=str, default='yolo,labelme',
+                        help='标注格式 (yolo/labelme，逗号分隔)')
+
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"❌ 模型文件不存在: {args.model}")
+        return
+
+    videos = find_videos(args.sources)
+    if not videos:
+        print("❌ 没有找到视频")
+        return
+
+    tasks = plan_segments(videos, args.segment)
+    total_seconds = sum(end - start for _, start, end in tasks if end is not None)
+    print(f"🎬 {len(videos)} 个视频, 共 {total_seconds / 3600:.2f} 小时, 切成 {len(tasks)} 个任务")
+    print(f"🔧 {args.workers} 个进程 x {args.threads} 线程, 每 {args.every:g}s 分析一帧")
+
+    start_time = time.time()
+    candidates = []
+    analysed = 0
+    done_seconds = 0.0
+    # 每段保留足够多的候选，保证全局 top-K 和最小间隔过滤后仍有余量
+    per_task = args.topk * 2
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(args.model, args.imgsz, args.device, args.threads)) as pool:
+        futures = [pool.submit(mine_segment, video, start, end, args.every,
+                               args.low, args.high, per_task)
+                   for video, start, end in tasks]
+        for i, future in enumerate(as_completed(futures), 1):
+            found, frames, seconds = future.result()
+            candidates += found
+            analysed += frames
+            done_seconds += seconds or 0.0
+            elapsed = time.time() - start_time
+            print(f"⏱️  [{i}/{len(tasks)}] 分析 {analysed} 帧, "
+                  f"速度 {done_seconds / max(elapsed, 1e-9):.1f}x 实时")
+
+    chosen = select(candidates, args.topk, args.min_gap)
+    print(f"📊 候选 {len(candidates)} 帧, 入选 {len(chosen)} 帧")
+
+    from ultralytics import YOLO
+    names = YOLO(args.model).names
+
+    output_dir = Path(args.output or f"datasets/mined/{time.strftime('%Y%m%d_%H%M%S')}")
+    formats = {f.strip() for f in args.format.split(',')}
+    rows = export(chosen, output_dir, names, args.label_conf, formats)
+
+    elapsed = time.time() - start_time
+    print(f"✅ 导出 {len(rows)} 帧到: {output_dir}/")
+    print(f"⏱️ 用时 {elapsed:.1f}s, 处理 {total_seconds / 3600:.2f} 小时录像 "
+          f"({total_seconds / max(elapsed, 1e-9):.1f}x 实时)")
+    print(f"🏷️ 检查标注: labelme {output_dir / 'images'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+近重复图片索引 - 感知哈希 + BK 树，快速查找汉明距离半径内的相似图片
+
+同一局录像截出的帧往往几乎一样，随机分割会让它们同时出现在训练集和
+验证集里。这里把近重复图片分组，供 split_dataset.py 按组分割或去重。
+哈希结果缓存在数据集目录下，新增/修改的图片才会重新计算。
+"""
+
+import os
+import json
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+CACHE_NAME = '.phash_cache.json'
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def phash(path, hash_size=8, highfreq_factor=4):
+    """64 位感知哈希：灰度缩放后取 DCT 低频系数，与中位数比较"""
+    size = hash_size * highfreq_factor
+    image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    image = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(np.float32(image))[:hash_size, :hash_size]
+    bits = (dct > np.median(dct)).flatten()
+    return int(''.join('1' if b else '0' for b in bits), 2)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """按汉明距离组织的 BK 树，半径查询只访问满足三角不等式的子树"""
+
+    def __init__(self):
+        self.root = None  # [哈希, [条目...], {距离: 子节点}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value, radius):
+        """返回 [(距离, 条目), ...]"""
+        found = []
+        if self.root is None:
+            return found
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found += [(distance, item) for item in node[1]]
+            for d, child in node[2].items():
+                if distance - radius <= d <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class ImageIndex:
+    """
+    数据集图片的感知哈希索引
+
+    哈希按 (文件大小, 修改时间) 缓存到 cache_path，update() 只重新
+    计算变化过的图片，并用进程池并行。
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.entries = {}  # 路径 -> (大小, 修改时间, 哈希)
+        if self.cache_path and self.cache_path.exists():
+            data = json.loads(self.cache_path.read_text())
+            self.entries = {path: (size, mtime, int(value, 16))
+                            for path, (size, mtime, value) in data.items()}
+        self.tree = None
+
+    def update(self, images, workers=None):
+        """同步索引到给定的图片列表，返回重新计算的数量"""
+        images = [Path(p) for p in images]
+        wanted = {str(p.resolve()): p for p in images}
+
+        stale = []
+        for key, path in wanted.items():
+            stat = path.stat()
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                stale.append((key, stat.st_size, stat.st_mtime_ns))
+
+        # 删掉已经不存在的图片
+        self.entries = {k: v for k, v in self.entries.items() if k in wanted}
+
+        if stale:
+            workers = workers or os.cpu_count() or 1
+            paths = [key for key, _, _ in stale]
+            if workers > 1 and len(paths) > 32:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    hashes = list(pool.map(phash, paths, chunksize=32))
+            else:
+                hashes = [phash(p) for p in paths]
+            for (key, size, mtime), value in zip(stale, hashes):
+                if value is None:
+                    print(f"⚠️ 无法读取图片: {key}")
+                    continue
+                self.entries[key] = (size, mtime, value)
+
+        self.tree = None
+        self.save()
+        return len(stale)
+
+    def save(self):
+        if not self.cache_path:
+            return
+        data = {path: [size, mtime, f"{value:016x}"]
+                for path, (size, mtime, value) in self.entries.items()}
+        self.cache_path.write_text(json.dumps(data))
+
+    def _build_tree(self):
+        if self.tree is None:
+            self.tree = BKTree()
+            for path, (_, _, value) in self.entries.items():
+                self.tree.add(value, path)
+        return self.tree
+
+    def query(self, path, radius):
+        """与某张已索引图片距离不超过 radius 的图片（含自身）"""
+        value = self.entries[str(Path(path).resolve())][2]
+        return self._build_tree().query(value, radius)
+
+    def groups(self, radius):
+        """按汉明距离 <= radius 的传递闭包分组（并查集），返回路径分组列表"""
+        parent = {path: path for path in self.entries}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        tree = self._build_tree()
+        for path, (_, _, value) in self.entries.items():
+            for _, other in tree.query(value, radius):
+                a, b = find(path), find(other)
+                if a != b:
+                    parent[a] = b
+
+        groups = {}
+        for path in self.entries:
+            groups.setdefault(find(path), []).append(path)
+        return sorted((sorted(g) for g in groups.values()), key=lambda g: g[0])
+
+
+def read_classes(label_path):
+    """标签文件中出现的类别和框数"""
+    if not label_path.exists():
+        return set(), 0
+    lines = [line.split() for line in label_path.read_text().splitlines() if line.strip()]
+    return {line[0] for line in lines}, len(lines)
+
+
+def prune_group(group, label_dir):
+    """
+    组内去重：按框数从多到少保留图片，直到覆盖组内出现过的所有类别
+
+    返回保留的图片列表（至少一张）。
+    """
+    info = []
+    for image in group:
+        classes, count = read_classes(Path(label_dir) / (Path(image).stem + '.txt'))
+        info.append((count, image, classes))
+    info.sort(key=lambda x: (-x[0], str(x[1])))
+
+    needed = set().union(*(classes for _, _, classes in info))
+    kept, covered = [], set()
+    for _, image, classes in info:
+        if not kept or classes - covered:
+            kept.append(image)
+            covered |= classes
+        if covered >= needed:
+            break
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description='近重复图片检查')
+    parser.add_argument('images', type=str, help='图片目录')
+    parser.add_argument('--radius', type=int, default=6,
+                        help='汉明距离阈值（64 位哈希）')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='计算哈希的进程数')
+    parser.add_argument('--output', type=str, default=None,
+                        help='把分组结果写入 JSON 文件')
+
+    args = parser.parse_args()
+
+    image_dir = Path(args.images)
+    images = sorted(p for p in image_dir.rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+    index = ImageIndex(image_dir / CACHE_NAME)
+    updated = index.update(images, args.workers)
+    print(f"🔍 索引 {len(index.entries)} 张图片 (重新计算 {updated} 张)")
+
+    groups = index.groups(args.radius)
+    duplicates = [g for g in groups if len(g) > 1]
+    print(f"📊 {len(groups)} 组, 其中 {len(duplicates)} 组含近重复图片")
+    label_dir = image_dir.parent / 'labels'
+    if label_dir.is_dir():
+        # 与 split_dataset.py --prune-dups 相同的规则：保留覆盖组内所有类别的图片
+        pruned = len(index.entries) - sum(len(prune_group(g, label_dir)) for g in groups)
+        print(f"✂️ --prune-dups 将去除 {pruned} 张")
+    else:
+        print(f"✂️ 每组只保留一张时可去除 {len(index.entries) - len(groups)} 张")
+    for group in sorted(duplicates, key=len, reverse=True)[:10]:
+        print(f"  {len(group)} 张: {', '.join(Path(p).name for p in group[:3])}"
+              f"{' ...' if len(group) > 3 else ''}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(groups, ensure_ascii=False, indent=2))
+        print(f"💾 分组已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,8 +9,17 @@ import random
 from pathlib import Path
 import argparse
 
-def split_dataset(source_dir, dest_dir, train_ratio=0.7, val_ratio=0.2, test_ratio=0.1):
-    """分割数据集"""
+from phash_index import ImageIndex, CACHE_NAME, prune_group
+
+def split_dataset(source_dir, dest_dir, train_ratio=0.7, val_ratio=0.2, test_ratio=0.1,
+                  dedup_radius=0, prune_dups=False, workers=None):
+    """
+    分割数据集
+
+    dedup_radius > 0 时先按感知哈希把近重复图片分组，整组分到同一个
+    划分里，避免训练集和验证集出现几乎相同的帧；prune_dups 时每组只
+    保留覆盖组内所有类别所需的最少图片。
+    """
     
     # 确保比例和为1
     assert abs(train_ratio + val_ratio + test_ratio - 1.0) < 0.001, "比例之和必须为1"
@@ -25,24 +34,55 @@ def split_dataset(source_dir, dest_dir, train_ratio=0.7, val_ratio=0.2, test_rat
     images = list(image_dir.glob('*.jpg')) + list(image_dir.glob('*.png'))
     print(f"找到 {len(images)} 张图片")
     
+    # 近重复分组（不去重时每张图片单独一组）
+    if dedup_radius > 0:
+        index = ImageIndex(image_dir / CACHE_NAME)
+        updated = index.update(images, workers)
+        print(f"🔍 感知哈希: 重新计算 {updated} 张, 其余使用缓存")
+        by_path = {str(p.resolve()): p for p in images}
+        groups = [[by_path[p] for p in group] for group in index.groups(dedup_radius)]
+        # 无法计算哈希的图片不参与分组，各自单独成组，仍然照常分割
+        unhashed = [p for key, p in by_path.items() if key not in index.entries]
+        if unhashed:
+            print(f"⚠️ {len(unhashed)} 张图片无法计算哈希，不参与近重复分组")
+        groups += [[p] for p in unhashed]
+        print(f"近重复分组: {len(groups)} 组 (半径 {dedup_radius})")
+        if prune_dups:
+            groups = [prune_group(group, label_dir) for group in groups]
+            pruned = len(images) - sum(len(g) for g in groups)
+            print(f"去除近重复图片: {pruned} 张")
+    else:
+        groups = [[image] for image in images]
+    
     # 随机打乱
     random.seed(42)
-    random.shuffle(images)
-    
-    # 计算分割点
-    total = len(images)
-    train_end = int(total * train_ratio)
-    val_end = train_end + int(total * val_ratio)
-    
-    # 分割数据
-    train_images = images[:train_end]
-    val_images = images[train_end:val_end]
-    test_images = images[val_end:]
+    random.shuffle(groups)
+    
+    total = sum(len(group) for group in groups)
+    ratios = (train_ratio, val_ratio, test_ratio)
+    splits = ([], [], [])
+    if all(len(group) == 1 for group in groups):
+        # 每张图片单独一组：按比例顺序切分
+        train_end = int(total * train_ratio)
+        val_end = train_end + int(total * val_ratio)
+        images = [group[0] for group in groups]
+        splits = (images[:train_end], images[train_end:val_end], images[val_end:])
+    else:
+        # 按组分割，同一组不会跨划分：大组优先，每组放进离目标数量差得最多的划分
+        for group in sorted(groups, key=len, reverse=True):
+            deficits = [total * ratio - len(split) if ratio > 0 else float('-inf')
+                        for ratio, split in zip(ratios, splits)]
+            splits[deficits.index(max(deficits))].extend(group)
+    train_images, val_images, test_images = splits
     
     print(f"训练集: {len(train_images)} 张")
     print(f"验证集: {len(val_images)} 张")
     print(f"测试集: {len(test_images)} 张")
     
+    for name, ratio, split in zip(('训练集', '验证集', '测试集'), ratios, splits):
+        if ratio > 0 and not split:
+            print(f"⚠️ {name}为空：近重复分组太大，请减小 --dedup-radius 或调整比例")
+    
     # 复制文件
     for split_name, split_images in [('train', train_images), 
                                        ('valid', val_images), 
@@ -108,6 +148,12 @@ def main():
                         help='目标目录')
     parser.add_argument('--ratio', type=str, default='0.7:0.2:0.1',
                         help='训练:验证:测试 比例')
+    parser.add_argument('--dedup-radius', type=int, default=0,
+                        help='近重复分组的汉明距离阈值（0 为不分组，推荐 4-8）')
+    parser.add_argument('--prune-dups', action='store_true',
+                        help='每组近重复图片只保留覆盖所有类别所需的最少图片')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='计算感知哈希的进程数')
     
     args = parser.parse_args()
     
@@ -121,7 +167,9 @@ def main():
     else:
         raise ValueError("比例格式错误，应该是 train:val 或 train:val:test")
     
-    split_dataset(args.source, args.dest, train_ratio, val_ratio, test_ratio)
+    split_dataset(args.source, args.dest, train_ratio, val_ratio, test_ratio,
+                  dedup_radius=args.dedup_radius, prune_dups=args.prune_dups,
+                  workers=args.workers)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
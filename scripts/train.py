@@ -4,16 +4,24 @@ YOLO 红色警戒单位识别 - MPS加速训练脚本
 """
 
 import argparse
-import torch
+import copy
+import csv
+import os
+import shutil
+import statistics
 from pathlib import Path
-from ultralytics import YOLO
 import yaml
 import time
 from datetime import datetime
 
 
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
 def check_mps():
     """检查MPS支持"""
+    import torch
+    
     if torch.backends.mps.is_available():
         if not torch.backends.mps.is_built():
             print("⚠️ PyTorch 未启用 MPS 构建")
@@ -27,7 +35,8 @@ def check_mps():
 
 
 def train(args):
-    """主训练函数"""
+    """主训练函数，返回最佳模型路径"""
+    from ultralytics import YOLO
     
     # 检查设备
     device = check_mps() if args.device == 'auto' else args.device
@@ -69,7 +78,7 @@ def train(args):
         'split': 'val',
         'save': True,
         'save_period': -1,
-        'cache': args.cache,
+        'cache': False if args.cache == 'compressed' else args.cache,
         'workers': args.workers,
         'patience': args.patience,
         'lr0': args.lr0,
@@ -114,7 +123,22 @@ def train(args):
     start_time = time.time()
     
     # 训练
-    results = model.train(**train_params)
+    trainer = None
+    if args.cache == 'compressed':
+        # 压缩共享缓存：固定内存预算，所有 dataloader 进程共用
+        import image_cache
+
+        image_cache.add_callbacks(model)
+        trainer = image_cache.make_trainer(image_cache.parse_size(args.cache_budget),
+                                           args.cache_quality)
+    if getattr(args, 'teacher', None) and args.distill_weight > 0:
+        # 教师蒸馏：检测损失上叠加教师输出的蒸馏项
+        import distill
+
+        distill.add_callbacks(model)
+        trainer = distill.make_trainer(args.teacher, args.distill_weight,
+                                       args.distill_temperature, base=trainer)
+    model.train(trainer=trainer, **train_params)
     
     # 训练完成
     elapsed_time = time.time() - start_time
@@ -124,11 +148,190 @@ def train(args):
     
     print(f"✅ 训练完成！")
     print(f"⏱️ 用时: {hours}小时 {minutes}分钟 {seconds}秒")
-    print(f"💾 模型保存位置: {args.project}/{train_params['name']}/weights/")
-    print(f"📊 最佳模型: {args.project}/{train_params['name']}/weights/best.pt")
+    # 名称已存在且未指定 --exist-ok 时 ultralytics 会改用 name2 等目录，以 trainer 为准
+    best = Path(model.trainer.best)
+    print(f"💾 模型保存位置: {best.parent}/")
+    print(f"📊 最佳模型: {best}")
     print(f"📈 TensorBoard: tensorboard --logdir {args.project}")
     
-    return results
+    return best
+
+
+def resolve_split(config, split):
+    """
+    解析数据集配置文件中某个划分的图片目录列表
+
+    交给 ultralytics 解析，相对路径的处理（path 缺省时相对配置文件目录、
+    Roboflow 导出的 ../train/images 等）与训练时完全一致。
+    """
+    from ultralytics.data.utils import check_det_dataset
+
+    entries = check_det_dataset(str(config)).get(split)
+    if not entries:
+        return []
+    if isinstance(entries, str):
+        entries = [entries]
+    return [Path(p) for p in entries]
+
+
+def build_pseudo_dataset(teacher_path, config, unlabeled, output_dir, device, conf=0.5, imgsz=640):
+    """
+    用教师模型给未标注图片打伪标注，并入训练集
+
+    unlabeled 为未标注图片目录列表（如难例挖掘导出的 datasets/mined/*/images）。
+    原训练集保持人工标注不变；验证/测试集不变，保证评估可比。
+    返回 (新的数据集配置文件路径, 教师添加的框数)。
+    """
+    from ultralytics import YOLO
+
+    with open(config) as f:
+        data = yaml.safe_load(f)
+
+    output_dir = Path(output_dir)
+    image_out = output_dir / 'pseudo' / 'images'
+    label_out = output_dir / 'pseudo' / 'labels'
+    image_out.mkdir(parents=True, exist_ok=True)
+    label_out.mkdir(parents=True, exist_ok=True)
+
+    images = []
+    for folder in map(Path, unlabeled):
+        images += sorted(p for p in folder.rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+    print(f"🧑‍🏫 教师模型: {teacher_path}")
+    print(f"📷 未标注图片: {len(images)} 张")
+
+    teacher = YOLO(teacher_path)
+    added = 0
+    for image_path, result in zip(images, teacher.predict(source=[str(p) for p in images],
+                                                          stream=True, conf=conf, imgsz=imgsz,
+                                                          device=device, verbose=False)):
+        # 图片用软链接，避免复制；不同目录的同名图片加上目录名区分
+        stem = f"{image_path.parent.parent.name}_{image_path.stem}"
+        target = image_out / f"{stem}{image_path.suffix}"
+        if not target.exists():
+            try:
+                os.symlink(image_path.resolve(), target)
+            except OSError:
+                shutil.copy2(image_path, target)
+
+        lines = []
+        boxes = result.boxes
+        if boxes is not None:
+            for cls, xywhn in zip(boxes.cls.tolist(), boxes.xywhn.tolist()):
+                lines.append(f"{int(cls)} " + " ".join(f"{v:.6f}" for v in xywhn))
+        added += len(lines)
+        (label_out / f"{stem}.txt").write_text("\n".join(lines) + ("\n" if lines else ""))
+
+    print(f"✅ 教师模型添加了 {added} 个伪标注框")
+
+    # 新配置：训练集 = 原训练集 + 伪标注图片，其余划分使用原始绝对路径
+    config_out = {k: v for k, v in data.items() if k not in ('path', 'train', 'val', 'test')}
+    config_out['train'] = [str(p) for p in resolve_split(config, 'train')] + [str(image_out.resolve())]
+    for split in ('val', 'test'):
+        folders = resolve_split(config, split)
+        if folders:
+            config_out[split] = [str(p) for p in folders] if len(folders) > 1 else str(folders[0])
+
+    yaml_path = output_dir / 'data.yaml'
+    with open(yaml_path, 'w') as f:
+        yaml.safe_dump(config_out, f, allow_unicode=True, sort_keys=False)
+    print(f"✅ 伪标注数据集配置: {yaml_path}")
+    return str(yaml_path), added
+
+
+def measure_cpu_latency(model_path, config, imgsz=640, runs=50, warmup=5):
+    """在验证集图片上测量 CPU 单张推理延迟（毫秒，中位数）"""
+    from ultralytics import YOLO
+
+    images = []
+    for folder in resolve_split(config, 'val'):
+        images += sorted(p for p in folder.rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+    if not images:
+        raise FileNotFoundError(f"验证集没有图片: {config}")
+
+    model = YOLO(model_path)
+    times = []
+    for i in range(warmup + runs):
+        result = model.predict(str(images[i % len(images)]), imgsz=imgsz, device='cpu',
+                               verbose=False)[0]
+        if i >= warmup:
+            times.append(sum(result.speed.values()))
+    return statistics.median(times)
+
+
+def report_tradeoff(model_paths, config, device, imgsz, output_path, notes=None):
+    """评估每个模型的 mAP 和 CPU 延迟，打印并保存对比表；notes 为每个模型的训练方式说明"""
+    from ultralytics import YOLO
+
+    rows = []
+    for model_path in model_paths:
+        print(f"📊 评估: {model_path}")
+        model = YOLO(model_path)
+        params = sum(p.numel() for p in model.model.parameters()) / 1e6
+        metrics = model.val(data=config, split='val', imgsz=imgsz,
+                            device=device, plots=False, verbose=False)
+        rows.append({
+            'model': str(model_path),
+            'params_M': params,
+            'mAP50': metrics.box.map50,
+            'mAP50-95': metrics.box.map,
+            'cpu_ms': measure_cpu_latency(model_path, config, imgsz=imgsz),
+            'notes': (notes or {}).get(model_path, ''),
+        })
+
+    print("\n📈 精度 / CPU 延迟对比:")
+    print(f"{'模型':<60} {'参数(M)':>8} {'mAP50':>7} {'mAP50-95':>9} {'CPU(ms)':>8}  说明")
+    for row in rows:
+        print(f"{row['model']:<60} {row['params_M']:>8.2f} {row['mAP50']:>7.3f} "
+              f"{row['mAP50-95']:>9.3f} {row['cpu_ms']:>8.1f}  {row['notes']}")
+
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"💾 对比表已保存: {output_path}")
+    return rows
+
+
+def compress(args):
+    """
+    压缩模式：把教师模型蒸馏到一个或多个更小的学生模型
+
+    --model 可用逗号分隔多个学生模型（如 yolov8n.pt,yolov8s.pt）。每个学生
+    都在检测损失之外拟合教师在同一批图片上的类别和框分布输出；指定
+    --unlabeled 时，教师先给这些未标注图片打伪标注并入训练集。最后统一
+    报告 mAP 与 CPU 延迟的对比。
+    """
+    device = check_mps() if args.device == 'auto' else args.device
+    base_name = args.name or f"red-alert-distill_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    run_dir = Path(args.project) / base_name
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    student_config, added = args.config, 0
+    if args.unlabeled:
+        student_config, added = build_pseudo_dataset(
+            args.teacher, args.config, args.unlabeled, run_dir / 'dataset', device,
+            conf=args.distill_conf, imgsz=args.imgsz,
+        )
+
+    note = f"蒸馏 权重={args.distill_weight:g} 温度={args.distill_temperature:g}, 伪标注框 {added}"
+    if args.distill_weight <= 0 and added == 0:
+        print("⚠️ 蒸馏权重为 0 且没有伪标注，学生模型相当于普通训练")
+    else:
+        print(f"🧑‍🏫 {note}")
+
+    students = []
+    for student in [m.strip() for m in args.model.split(',') if m.strip()]:
+        student_args = copy.copy(args)
+        student_args.model = student
+        student_args.config = student_config
+        student_args.name = f"{base_name}_{Path(student).stem}"
+        students.append(train(student_args))
+
+    # 用原始数据集评估，保证与教师模型可比
+    notes = {args.teacher: '教师'}
+    notes.update({path: note for path in students})
+    return report_tradeoff([args.teacher] + students, args.config, device, args.imgsz,
+                           run_dir / 'compression_report.csv', notes)
 
 
 def main():
@@ -162,7 +365,12 @@ def main():
     parser.add_argument('--patience', type=int, default=50,
                         help='早停耐心值')
     parser.add_argument('--cache', type=str, default='ram',
-                        help='数据缓存 (True/ram/disk/False)')
+                        help='数据缓存 (True/ram/disk/compressed/False)')
+    parser.add_argument('--cache-budget', type=str, default='2G',
+                        help='compressed 缓存的内存预算 (如 512M/2G)')
+    parser.add_argument('--cache-quality', type=int, default=100,
+                        help='compressed 缓存质量：100 为无损 PNG；小于 100 用 JPEG，'
+                             '更省内存但命中时得到有损像素，训练数据随缓存状态变化')
     parser.add_argument('--workers', type=int, default=8,
                         help='数据加载线程数')
     parser.add_argument('--amp', action='store_true',
@@ -178,10 +386,25 @@ def main():
     parser.add_argument('--exist-ok', action='store_true',
                         help='覆盖已存在的项目')
     
+    # 压缩（蒸馏）参数
+    parser.add_argument('--teacher', type=str, default=None,
+                        help='教师模型路径，指定后进入蒸馏压缩模式')
+    parser.add_argument('--distill-conf', type=float, default=0.5,
+                        help='教师伪标注的置信度阈值')
+    parser.add_argument('--distill-weight', type=float, default=1.0,
+                        help='蒸馏损失权重（0 为关闭输出蒸馏）')
+    parser.add_argument('--distill-temperature', type=float, default=2.0,
+                        help='蒸馏温度')
+    parser.add_argument('--unlabeled', type=str, nargs='*', default=[],
+                        help='未标注图片目录（如 datasets/mined/*/images），由教师打伪标注后并入训练集')
+    
     args = parser.parse_args()
     
     # 执行训练
-    train(args)
+    if args.teacher:
+        compress(args)
+    else:
+        train(args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+分阶段耗时统计 - 计时器、计数器、直方图，支持 Prometheus 文本和 Chrome trace 导出
+
+默认关闭，关闭时 span() 返回一个共享的空操作对象，几乎没有开销：
+
+    from telemetry import telemetry
+
+    telemetry.enable(trace=True)
+    with telemetry.span('decode'):
+        ...
+    telemetry.write_chrome_trace('trace.json')   # chrome://tracing 或 ui.perfetto.dev 打开
+"""
+
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 直方图分桶上界（秒），覆盖 1ms ~ 10s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ultralytics Results.speed 的键 -> 阶段名
+SPEED_STAGES = (('preprocess', 'preprocess'), ('inference', 'forward'), ('postprocess', 'nms'))
+
+
+class Histogram:
+    """累积分桶直方图（Prometheus 语义）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class Telemetry:
+    """进程内的指标收集器"""
+
+    def __init__(self, prefix='yolo_ra', max_events=200000):
+        self.prefix = prefix
+        self.max_events = max_events
+        self.enabled = False
+        self.trace = False
+        self.counters = {}
+        self.histograms = {}
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._server = None
+
+    def enable(self, trace=False):
+        """开启统计；trace=True 时同时记录 Chrome trace 事件"""
+        self.enabled = True
+        self.trace = trace
+        return self
+
+    def span(self, name, sink=None):
+        """
+        计时上下文，结束时记录到直方图（和 trace）
+
+        sink 为带 record(name, seconds) 方法的对象（如 LatencyController），
+        即使统计关闭也会把耗时转交给它。
+        """
+        if not self.enabled and sink is None:
+            return _NULL_SPAN
+        return _Span(self, name, sink)
+
+    def observe(self, name, seconds, start=None):
+        """记录一个阶段耗时；start 为 perf_counter 起点，用于生成 trace 事件"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+            if self.trace and start is not None and len(self.events) < self.max_events:
+                self.events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': (start - self._origin) * 1e6,
+                    'dur': seconds * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                })
+
+    def count(self, name, value=1):
+        """计数器累加"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_speed(self, speed, start=None):
+        """
+        记录 ultralytics Results.speed（毫秒）中的 预处理/前向/NMS 耗时
+
+        传入推理开始时刻时，三个阶段在 trace 中按顺序排列。
+        """
+        if not self.enabled or not speed:
+            return
+        for key, name in SPEED_STAGES:
+            ms = speed.get(key)
+            if ms is None:
+                continue
+            self.observe(name, ms / 1000, start)
+            if start is not None:
+                start += ms / 1000
+
+    def to_prometheus(self):
+        """导出 Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+
+            metric = f"{self.prefix}_stage_seconds"
+            if self.histograms:
+                lines.append(f"# HELP {metric} Time spent per pipeline stage.")
+                lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(histogram.buckets, histogram.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {histogram.sum:.6f}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_chrome_trace(self, path):
+        """导出 Chrome trace JSON（chrome://tracing / Perfetto 可直接打开）"""
+        with self._lock:
+            events = list(self.events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"💾 Trace 已保存: {path} ({len(events)} 个事件)")
+
+    def summary(self):
+        """各阶段耗时汇总文本，按总耗时降序"""
+        with self._lock:
+            items = sorted(self.histograms.items(), key=lambda kv: kv[1].sum, reverse=True)
+            counters = dict(self.counters)
+        lines = [f"{'阶段':<14} {'次数':>8} {'平均(ms)':>10} {'总计(s)':>10}"]
+        for name, histogram in items:
+            lines.append(f"{name:<14} {histogram.count:>8} {histogram.mean * 1000:>10.2f} "
+                         f"{histogram.sum:>10.2f}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def serve_prometheus(self, port, host='0.0.0.0'):
+        """在后台线程启动 /metrics 接口"""
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = collector.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"📈 Prometheus 指标: http://localhost:{port}/metrics")
+        return self._server
+
+    def finish(self, trace_path=None):
+        """运行结束：打印汇总并按需写出 trace"""
+        if not self.enabled:
+            return
+        print("\n⏱️  阶段耗时:")
+        print(self.summary())
+        if trace_path:
+            self.write_chrome_trace(trace_path)
+
+
+class _Span:
+    def __init__(self, telemetry, name, sink):
+        self.telemetry = telemetry
+        self.name = name
+        self.sink = sink
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.telemetry.observe(self.name, seconds, self.start)
+        if self.sink is not None:
+            self.sink.record(self.name, seconds)
+        return False
+
+
+class _NullSpan:
+    start = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+# 进程级共享实例
+telemetry = Telemetry()
+
+
+def add_arguments(parser):
+    """给脚本添加统一的 --profile / --metrics-port 参数"""
+    parser.add_argument('--profile', type=str, default=None, metavar='TRACE_JSON',
+                        help='开启分阶段计时，并把 Chrome trace 写到该文件')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='开启分阶段计时，并在该端口提供 Prometheus /metrics')
+
+
+def setup_from_args(args):
+    """根据 add_arguments() 添加的参数开启统计"""
+    if args.profile or args.metrics_port:
+        telemetry.enable(trace=bool(args.profile))
+    if args.metrics_port:
+        telemetry.serve_prometheus(args.metrics_port)
+    return telemetry
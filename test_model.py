@@ -3,8 +3,18 @@
 测试训练好的模型
 """
 
-from ultralytics import YOLO
 from pathlib import Path
+import argparse
+
+from telemetry import telemetry, add_arguments, setup_from_args
+
+parser = argparse.ArgumentParser(description='测试训练好的模型')
+add_arguments(parser)
+args = parser.parse_args()
+setup_from_args(args)
+
+# 参数解析之后再导入重型依赖，--help 无需加载 torch
+from ultralytics import YOLO
 import torch
 
 # 检查模型文件
@@ -16,7 +26,8 @@ if not model_path.exists():
 
 # 加载模型
 print(f"📦 加载模型: {model_path}")
-model = YOLO(model_path)
+with telemetry.span('load_model'):
+    model = YOLO(model_path)
 
 # 设备选择
 device = 'mps' if torch.backends.mps.is_available() else 'cpu'
@@ -24,11 +35,12 @@ print(f"🔧 使用设备: {device}")
 
 # 在测试集上评估
 print("\n📊 在测试集上评估...")
-metrics = model.val(
-    data='datasets/red-alert/data.yaml',
-    split='test',
-    device=device
-)
+with telemetry.span('val'):
+    metrics = model.val(
+        data='datasets/red-alert/data.yaml',
+        split='test',
+        device=device
+    )
 
 # 打印评估结果
 print("\n📈 评估结果:")
@@ -39,16 +51,20 @@ print(f"mAP50-95: {metrics.box.map:.3f}")
 test_images = Path("datasets/red-alert/test/images")
 if test_images.exists():
     print("\n🎯 对测试图片进行推理...")
-    results = model.predict(
-        source=test_images,
-        save=True,
-        save_txt=True,
-        conf=0.25,
-        device=device,
-        project='runs/predict',
-        name='test_results',
-        exist_ok=True
-    )
+    with telemetry.span('predict'):
+        results = model.predict(
+            source=test_images,
+            save=True,
+            save_txt=True,
+            conf=0.25,
+            device=device,
+            project='runs/predict',
+            name='test_results',
+            exist_ok=True
+        )
+    for result in results:
+        telemetry.observe_speed(result.speed)
+        telemetry.count('images')
     print(f"✅ 预测结果保存在: runs/predict/test_results/")
     
 # 类别性能
@@ -59,6 +75,8 @@ for i, name in names.items():
         ap = metrics.box.ap50[i]
         print(f"  {name}: AP50={ap:.3f}")
 
+telemetry.finish(args.profile)
+
 print("\n💡 提示:")
 print("- 查看预测结果: open runs/predict/test_results/")
 print("- 启动Web演示: python3 scripts/demo.py --model runs/train/red-alert-v1/weights/best.pt")
\ No newline at end of file
@@ -3,28 +3,100 @@
 测试视频检测
 """
 
+import time
+import argparse
+from pathlib import Path
+
+import video_source
+from telemetry import telemetry, add_arguments, setup_from_args
+
+parser = argparse.ArgumentParser(description='测试视频检测')
+parser.add_argument('video', nargs='?', default='~/Desktop/open-ra.mp4',
+                    help='视频路径')
+add_arguments(parser)
+video_source.add_arguments(parser)
+args = parser.parse_args()
+setup_from_args(args)
+
+# 参数解析之后再导入重型依赖，--help 无需加载 torch
 from ultralytics import YOLO
-import sys
 
 # 加载模型
-model = YOLO('runs/red-alert_20250901_001914/weights/best.pt')
+with telemetry.span('load_model'):
+    model = YOLO('runs/red-alert_20250901_001914/weights/best.pt')
 
 # 视频路径
-video_path = sys.argv[1] if len(sys.argv) > 1 else '~/Desktop/open-ra.mp4'
-
-# 预测
-print(f"🎯 正在检测: {video_path}")
-results = model.predict(
-    source=video_path,
-    save=True,           # 保存结果
-    conf=0.25,          # 置信度阈值
-    save_txt=False,     # 不保存文本
-    save_conf=True,     # 保存置信度
-    show_labels=True,   # 显示标签
-    show_conf=True,     # 显示置信度
-    line_thickness=2,   # 线条粗细
-)
-
-print(f"✅ 检测完成！")
-print(f"📁 结果保存在: runs/detect/")
-print(f"🎬 打开查看: open runs/detect/predict*/")
\ No newline at end of file
+video_path = args.video
+
+# 指定了采样参数：只解码需要分析的帧
+if video_source.is_sampling(args):
+    import cv2
+
+    source = video_source.from_args(video_path, args)
+    print(f"🎯 正在检测: {video_path} ({source.describe()})")
+
+    output_dir = Path('runs/detect/sampled')
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"{Path(video_path).stem}.mp4"
+    out_fps = 1 / args.every if args.every else source.fps / source.stride
+    writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*'mp4v'),
+                             max(out_fps, 1), (source.width, source.height))
+
+    start_time = time.time()
+    frames = iter(source)
+    while True:
+        with telemetry.span('decode'):
+            item = next(frames, None)
+        if item is None:
+            break
+        _, _, frame = item
+        with telemetry.span('infer') as span:
+            result = model(frame, conf=0.25, verbose=False)[0]
+        telemetry.observe_speed(result.speed, span.start)
+        with telemetry.span('plot'):
+            annotated = result.plot(line_width=2)
+        with telemetry.span('encode'):
+            writer.write(annotated)
+        telemetry.count('frames')
+        telemetry.count('detections', len(result.boxes) if result.boxes is not None else 0)
+    writer.release()
+    source.release()
+
+    elapsed = time.time() - start_time
+    print(f"📊 逐帧解码 {source.decoded} 帧, 定位 {source.seeks} 次, "
+          f"分析 {source.yielded} 帧, 用时 {elapsed:.1f}s")
+    telemetry.finish(args.profile)
+    print("✅ 检测完成！")
+    print(f"📁 结果保存在: {output_path}")
+
+else:
+    # 预测
+    print(f"🎯 正在检测: {video_path}")
+    results = model.predict(
+        source=video_path,
+        save=True,           # 保存结果
+        conf=0.25,          # 置信度阈值
+        save_txt=False,     # 不保存文本
+        save_conf=True,     # 保存置信度
+        show_labels=True,   # 显示标签
+        show_conf=True,     # 显示置信度
+        line_thickness=2,   # 线条粗细
+        stream=True,        # 逐帧返回，避免把整段视频的结果留在内存里
+    )
+
+    # 逐帧消费：两次 yield 之间除去预处理/前向/NMS 的时间，即解码、绘制和编码写出
+    start = time.perf_counter()
+    for result in results:
+        end = time.perf_counter()
+        model_seconds = sum(result.speed.values()) / 1000
+        telemetry.observe('decode+plot+encode', max(end - start - model_seconds, 0.0), start)
+        telemetry.observe_speed(result.speed, end - model_seconds)
+        telemetry.count('frames')
+        telemetry.count('detections', len(result.boxes) if result.boxes is not None else 0)
+        start = time.perf_counter()
+
+    telemetry.finish(args.profile)
+
+    print(f"✅ 检测完成！")
+    print(f"📁 结果保存在: runs/detect/")
+    print(f"🎬 打开查看: open runs/detect/predict*/")
@@ -3,11 +3,34 @@
 快速训练脚本 - 使用 Roboflow 数据集
 """
 
+import argparse
+
+parser = argparse.ArgumentParser(description='快速训练（Roboflow 数据集）')
+parser.add_argument('--data', type=str, default='datasets/red-alert/data.yaml',
+                    help='数据集配置文件')
+parser.add_argument('--model', type=str, default='yolov8n.pt',
+                    help='预训练模型')
+parser.add_argument('--epochs', type=int, default=200,
+                    help='训练轮数')
+parser.add_argument('--batch', type=int, default=8,
+                    help='批次大小（数据少，用小batch）')
+parser.add_argument('--imgsz', type=int, default=640,
+                    help='图像大小')
+parser.add_argument('--device', type=str, default='auto',
+                    help='训练设备 (auto/mps/cpu/0)')
+parser.add_argument('--name', type=str, default='red-alert-v1',
+                    help='实验名称')
+args = parser.parse_args()
+
+# 参数解析之后再导入重型依赖，--help 无需加载 torch
 from ultralytics import YOLO
 import torch
 
 # 检查设备
-if torch.backends.mps.is_available():
+if args.device != 'auto':
+    device = args.device
+    print(f"🔧 使用设备: {device}")
+elif torch.backends.mps.is_available():
     device = 'mps'
     print("✅ 使用 Apple Silicon GPU (MPS) 加速")
 else:
@@ -15,20 +38,20 @@ else:
     print("⚠️ 使用 CPU 训练")
 
 # 加载预训练模型
-model = YOLO('yolov8n.pt')  # 使用最小的模型快速测试
+model = YOLO(args.model)  # 默认使用最小的模型快速测试
 
 # 训练参数（针对小数据集优化）
 results = model.train(
-    data='datasets/red-alert/data.yaml',  # 数据集配置
-    epochs=200,  # 增加到200轮，获得更好效果
-    imgsz=640,  # 图像大小
-    batch=8,  # 批次大小（数据少，用小batch）
+    data=args.data,  # 数据集配置
+    epochs=args.epochs,  # 默认200轮，获得更好效果
+    imgsz=args.imgsz,  # 图像大小
+    batch=args.batch,  # 批次大小
     device=device,  # 使用MPS加速
     patience=20,  # 早停耐心值
     save=True,  # 保存模型
     plots=True,  # 生成图表
     project='runs/train',  # 保存路径
-    name='red-alert-v1',  # 实验名称
+    name=args.name,  # 实验名称
     exist_ok=True,  # 覆盖已存在的
     
     # 数据增强（适度）
@@ -55,9 +78,9 @@ results = model.train(
 )
 
 print("\n✅ 训练完成！")
-print(f"📊 模型保存位置: runs/train/red-alert-v1/weights/")
-print(f"   - 最佳模型: runs/train/red-alert-v1/weights/best.pt")
-print(f"   - 最后模型: runs/train/red-alert-v1/weights/last.pt")
+print(f"📊 模型保存位置: runs/train/{args.name}/weights/")
+print(f"   - 最佳模型: runs/train/{args.name}/weights/best.pt")
+print(f"   - 最后模型: runs/train/{args.name}/weights/last.pt")
 print("\n下一步：")
 print("1. 查看训练结果: tensorboard --logdir runs/train")
 print("2. 测试模型: python test_model.py")
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+视频读取层 - 跳帧、按时间采样、只解关键帧、区间定位和多线程解码
+
+默认使用 OpenCV；只解关键帧需要 PyAV（可选依赖，pip install av）：
+
+    with VideoSource('replay.mp4', every=1.0, start=60, end=600) as source:
+        for index, timestamp, frame in source:
+            ...
+
+OpenCV 后端产出的 frame 来自预先分配、循环复用的缓冲区，只在之后
+buffers 帧内有效，需要长期保存时请自行 frame.copy()。
+"""
+
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:  # PyAV 是可选依赖
+    av = None
+
+
+# 距离下一个采样点超过这么多秒时直接 seek，而不是逐帧解码过去
+SEEK_THRESHOLD = 2.0
+
+
+class VideoSource:
+    """
+    按需解码的视频源
+
+    stride:          每 stride 帧取一帧（运行中可修改，供延迟控制器使用）
+    every:           每隔多少秒取一帧，指定后忽略 stride
+    start / end:     只处理该时间区间（秒）
+    keyframes_only:  只解码关键帧（仅 PyAV）
+    threads:         解码线程数，0 表示自动
+    backend:         'auto' / 'pyav' / 'opencv'
+    buffers:         循环复用的帧缓冲区个数（仅 OpenCV）
+
+    decoded 统计本对象逐帧解码的帧数；定位（seek）时解码器内部从关键帧
+    解到目标帧的部分无法得知，定位次数单独记在 seeks 中。
+    """
+
+    def __init__(self, path, stride=1, every=None, start=None, end=None,
+                 keyframes_only=False, threads=0, backend='auto', buffers=4):
+        self.path = str(Path(path).expanduser()) if not str(path).isdigit() else int(path)
+        self.stride = max(1, int(stride))
+        self.every = every
+        self.start = start or 0.0
+        self.end = end
+        self.keyframes_only = keyframes_only
+        self.threads = threads
+
+        if backend == 'auto':
+            # OpenCV 全量解码更快；只有只解关键帧时才需要 PyAV
+            backend = 'pyav' if keyframes_only and av is not None else 'opencv'
+        if backend == 'pyav' and av is None:
+            raise ImportError("PyAV 未安装: pip install av")
+        self.backend = backend
+
+        self._buffers = [None] * max(1, buffers)
+        self._slot = 0
+
+        if backend == 'pyav':
+            self._open_pyav()
+        else:
+            self._open_opencv()
+
+        self.decoded = 0  # 逐帧解码的帧数
+        self.yielded = 0  # 产出的帧数
+        self.seeks = 0    # 定位次数
+
+    # ------------------------------------------------------------------ 打开
+
+    def _open_pyav(self):
+        self.container = av.open(self.path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        if self.threads:
+            self.stream.thread_count = self.threads
+        if self.keyframes_only:
+            self.stream.codec_context.skip_frame = 'NONKEY'
+
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 30.0
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.frame_count = self.stream.frames or 0
+        if self.stream.duration is not None:
+            self.duration = float(self.stream.duration * self.stream.time_base)
+        elif self.container.duration is not None:
+            self.duration = self.container.duration / av.time_base
+        else:
+            self.duration = self.frame_count / self.fps if self.frame_count else None
+
+    def _open_opencv(self):
+        if self.keyframes_only:
+            print("⚠️ OpenCV 后端不支持只解关键帧，将按普通方式解码（安装 PyAV 以启用）")
+        if self.threads and isinstance(self.path, str) and hasattr(cv2, 'CAP_PROP_N_THREADS'):
+            # 解码线程数只能作为打开参数传入，打开后再 set 不生效
+            self.cap = cv2.VideoCapture(self.path, cv2.CAP_FFMPEG,
+                                        [cv2.CAP_PROP_N_THREADS, self.threads])
+        else:
+            if self.threads and isinstance(self.path, str):
+                # 旧版 OpenCV 只能通过环境变量设置 FFmpeg 解码线程
+                os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS', f"threads;{self.threads}")
+            self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise IOError(f"无法打开视频: {self.path}")
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = max(0, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.duration = self.frame_count / self.fps if self.frame_count else None
+
+    # ------------------------------------------------------------------ 采样
+
+    def _buffer(self, shape):
+        """取下一个循环缓冲区，尺寸不符时重新分配"""
+        buf = self._buffers[self._slot]
+        if buf is None or buf.shape != shape:
+            buf = self._buffers[self._slot] = np.empty(shape, dtype=np.uint8)
+        self._slot = (self._slot + 1) % len(self._buffers)
+        return buf
+
+    def _wanted(self, index, timestamp, state):
+        """判断一帧是否需要；state 记录上一次采样的位置"""
+        if self.every:
+            if timestamp + 1e-6 >= state['next_time']:
+                # 对齐到采样网格，避免误差累积
+                steps = int((timestamp - state['next_time']) // self.every) + 1
+                state['next_time'] += steps * self.every
+                return True
+            return False
+        if state['last_index'] is None or index - state['last_index'] >= self.stride:
+            state['last_index'] = index
+            return True
+        return False
+
+    def __iter__(self):
+        if self.backend == 'pyav':
+            return self._iter_pyav()
+        return self._iter_opencv()
+
+    def _iter_pyav(self):
+        stream = self.stream
+        time_base = stream.time_base
+        state = {'next_time': self.start, 'last_index': None}
+        last_seek = None
+
+        if self.start > 0:
+            self.container.seek(int(self.start / time_base), stream=stream, backward=True)
+            self.seeks += 1
+
+        while True:
+            seek_to = None
+            for packet in self.container.demux(stream):
+                for frame in packet.decode():
+                    self.decoded += 1
+                    if frame.pts is None:
+                        continue
+                    timestamp = float(frame.pts * time_base)
+                    if timestamp < self.start:
+                        continue
+                    if self.end is not None and timestamp > self.end:
+                        return
+                    index = int(round(timestamp * self.fps))
+
+                    if self._wanted(index, timestamp, state):
+                        # 只对需要的帧做颜色转换；to_ndarray 本身就分配新数组，无需再复制
+                        self.yielded += 1
+                        yield index, timestamp, frame.to_ndarray(format='bgr24')
+
+                    # 下一个采样点很远：直接跳到它之前的关键帧。
+                    # 同一目标只跳一次，GOP 比阈值长时避免反复跳回同一关键帧
+                    if (self.every and state['next_time'] - timestamp > SEEK_THRESHOLD
+                            and state['next_time'] != last_seek):
+                        seek_to = last_seek = state['next_time']
+                        break
+                if seek_to is not None:
+                    break
+
+            if seek_to is None:
+                return
+            if self.end is not None and seek_to > self.end:
+                return
+            self.container.seek(int(seek_to / time_base), stream=stream, backward=True)
+            self.seeks += 1
+
+    def _iter_opencv(self):
+        cap = self.cap
+        state = {'next_time': self.start, 'last_index': None}
+
+        if self.start > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, self.start * 1000)
+            self.seeks += 1
+        index = max(0, int(round(cap.get(cv2.CAP_PROP_POS_FRAMES))))
+
+        while True:
+            # grab() 只解码不做颜色转换，跳过的帧代价最小
+            if not cap.grab():
+                return
+            self.decoded += 1
+            timestamp = index / self.fps
+            if self.end is not None and timestamp > self.end:
+                return
+
+            if self._wanted(index, timestamp, state):
+                buf = self._buffer((self.height, self.width, 3))
+                ok, image = cap.retrieve(buf)
+                if not ok:
+                    return
+                if image is not buf:  # 尺寸与预期不一致时 OpenCV 会重新分配
+                    buf = image
+                self.yielded += 1
+                yield index, timestamp, buf
+
+            index += 1
+            # 下一个采样点很远：按帧号直接定位
+            if self.every and state['next_time'] - timestamp > SEEK_THRESHOLD:
+                index = int(round(state['next_time'] * self.fps))
+                if self.frame_count and index >= self.frame_count:
+                    return
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                self.seeks += 1
+
+    # ------------------------------------------------------------------ 其它
+
+    def release(self):
+        if self.backend == 'pyav':
+            self.container.close()
+        else:
+            self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def describe(self):
+        """视频和采样方式的可读描述"""
+        text = f"{self.width}x{self.height} @ {self.fps:.0f}fps"
+        if self.duration:
+            text += f", {self.duration:.0f}s"
+        if self.every:
+            text += f", 每 {self.every:g}s 取一帧"
+        elif self.stride > 1:
+            text += f", 每 {self.stride} 帧取一帧"
+        if self.start or self.end is not None:
+            end = f"{self.end:g}" if self.end is not None else "结尾"
+            text += f", 区间 {self.start:g}s-{end}"
+        if self.keyframes_only:
+            text += ", 仅关键帧"
+        return text + f" [{self.backend}]"
+
+
+def add_arguments(parser):
+    """给脚本添加统一的采样参数"""
+    parser.add_argument('--stride', type=int, default=1,
+                        help='每 N 帧取一帧')
+    parser.add_argument('--every', type=float, default=None,
+                        help='每隔多少秒取一帧（优先于 --stride）')
+    parser.add_argument('--start', type=float, default=None,
+                        help='起始时间（秒）')
+    parser.add_argument('--end', type=float, default=None,
+                        help='结束时间（秒）')
+    parser.add_argument('--keyframes', action='store_true',
+                        help='只解码关键帧（需要 PyAV）')
+    parser.add_argument('--decode-threads', type=int, default=0,
+                        help='解码线程数（0 为自动）')
+    parser.add_argument('--backend', type=str, default='auto',
+                        choices=['auto', 'pyav', 'opencv'],
+                        help='解码后端')
+
+
+def from_args(path, args, **kwargs):
+    """用 add_arguments() 添加的参数创建 VideoSource"""
+    return VideoSource(path, stride=args.stride, every=args.every, start=args.start,
+                       end=args.end, keyframes_only=args.keyframes,
+                       threads=args.decode_threads, backend=args.backend, **kwargs)
+
+
+def is_sampling(args):
+    """是否指定了任何采样或解码参数"""
+    return (args.stride > 1 or args.every or args.start or args.end is not None
+            or args.keyframes or args.decode_threads or args.backend != 'auto')